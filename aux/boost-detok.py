@@ -1,40 +1,97 @@
 #!/usr/bin/env python
 
 """This script de-tokenizes a few things, so that there is less clutter (fewer differences) in comparison
-with detokenize. Usage: boost-detok.py < STDIN > STDOUT. Suitable for --b1/b2 in colot-mt-diff.pl"""
+with detokenize. Usage: boost-detok.py [-j JOBS] < STDIN > STDOUT. Suitable for --b1/b2 in colot-mt-diff.pl"""
 
+import argparse
+import io
+import itertools
+import multiprocessing
 import re
 import regex
 import sys
+from typing import List
+try:
+    import re2  # optional (pip install google-re2): linear-time engine
+except ImportError:
+    re2 = re
+
+# re2 is used only for patterns that (1) have no \b, \s, \d, IGNORECASE (ASCII-only or different in re2) or \p{...}
+# (regex only) and (2) mostly scan without matching. Patterns that match often are faster with re, as each re2 match
+# has to cross the Python wrapper.
+
+# Stray Windows-1252 punctuation characters and their proper Unicode counterparts
+windows1252_punct_dict = {'\x99': '™', '\x91': '‘', '\x92': '’', '\x94': '”', '\x93': '“', '\x96': '–', '\x97': '—'}
+windows1252_punct_table = str.maketrans(windows1252_punct_dict)
+re_horizontal_space = re.compile(r'(?: |\t|&#160;)+')
+re_attach_both_mt_punct = re.compile(r'\s+@([-:/])@\s+')
+re_attach_right_mt_punct = re.compile(r'(\s[-:/])@\s+')
+re_attach_left_mt_punct = re.compile(r'\s+@([-:/]\s)')
+re_final_punct = re.compile(r'\s+([.!?])$')
+re_mid_sentence_punct = regex.compile(r'(\pL\pM*)\s+([,;]\s+)')
+re_no_break_space = re2.compile('(?:\u00A0|&#160;)+')
+re_clitic = re.compile(r" (['’])(d|em|m|re|s|ve) ")
+re_percent = re.compile(r'(\d) ([%]) ')
+re_currency_prefix = re.compile(r' ([$]|US$|RMB) (\d)')
+re_colon = regex.compile(r'(\pL) ([:]) ')
+re_opening_punct = re.compile(r' ([(“‘\[]) ')
+re_closing_punct = re.compile(r' ([)!?”])')
+re_trailing_punct = re.compile(r' ([.,;।’!?]’?”?’?\'?"?\)?]?”?|!+|\?+) ')
+re_cannot = re.compile(r' (can) (not) ', flags=re.IGNORECASE)
+re_apostrophe_s = re.compile(r" ([i’]) s ")
+re_comma_quote = re.compile(r'(, ") ([a-z])', flags=re.IGNORECASE)
+re_negated_aux = re.compile(r"\b(are|ca|could|did|do|does|had|has|have|is|sha|should|was|were|wo|would) ?n['’]?t\b",
+                            flags=re.IGNORECASE)
+
+
+def process_line(line: str) -> str:
+    """Re-detokenizes a single line."""
+    line = ' ' + line.strip() + ' '
+    line = line.translate(windows1252_punct_table)
+    line = re_horizontal_space.sub(' ', line)
+    line = re_attach_both_mt_punct.sub(r'\1', line)  # @-@
+    line = re_attach_right_mt_punct.sub(r'\1', line)  # -@
+    line = re_attach_left_mt_punct.sub(r'\1', line)  # @-
+    line = re_final_punct.sub(r'\1', line)  # attach sentence-final .!?
+    line = re_mid_sentence_punct.sub(r'\1\2', line)  # attach mid-sentence ,;
+    line = re_no_break_space.sub(' ', line)
+    for _ in range(2):
+        prev_line = line
+        line = re_clitic.sub(r'\1\2 ', line)
+        line = re_percent.sub(r'\1\2 ', line)
+        line = re_currency_prefix.sub(r' \1\2', line)
+        line = re_colon.sub(r'\1\2 ', line)
+        line = re_opening_punct.sub(r' \1', line)
+        line = re_closing_punct.sub(r'\1', line)
+        line = re_trailing_punct.sub(r'\1 ', line)
+        line = re_cannot.sub(r' \1\2 ', line)
+        line = re_apostrophe_s.sub("\1s ", line)
+        line = re_comma_quote.sub(r'\1\2', line)
+        line = re_negated_aux.sub(r"\1n't", line)
+        if line == prev_line:
+            break  # no change, so another pass would not change anything either
+    return line.strip()
+
+
+def process_lines(lines: List[str]) -> List[str]:
+    return [process_line(line) + '\n' for line in lines]
+
 
 if __name__ == "__main__":
-    for line in sys.stdin:
-        line = ' ' + line.strip() + ' '
-        line = re.sub('', '™', line)
-        line = re.sub('', '‘', line)
-        line = re.sub('', '’', line)
-        line = re.sub('', '”', line)
-        line = re.sub('', '“', line)
-        line = re.sub('', '–', line)
-        line = re.sub('', '—', line)
-        line = re.sub(r'(?: |\t|&#160;)+', ' ', line)
-        line = re.sub(r'\s+@([-:/])@\s+', r'\1', line)  # @-@
-        line = re.sub(r'(\s[-:/])@\s+', r'\1', line)  # -@
-        line = re.sub(r'\s+@([-:/]\s)', r'\1', line)  # @-
-        line = re.sub(r'\s+([.!?])$', r'\1', line)  # attach sentence-final .!?
-        line = regex.sub(r'(\pL\pM*)\s+([,;]\s+)', r'\1\2', line)  # attach mid-sentence ,;
-        line = re.sub(r'(?:\u00A0|&#160;)+', ' ', line)
-        for _ in range(2):
-            line = re.sub(r" (['’])(d|em|m|re|s|ve) ", r'\1\2 ', line)
-            line = re.sub(r'(\d) ([%]) ', r'\1\2 ', line)
-            line = re.sub(r' ([$]|US$|RMB) (\d)', r' \1\2', line)
-            line = regex.sub(r'(\pL) ([:]) ', r'\1\2 ', line)
-            line = re.sub(r' ([(“‘\[]) ', r' \1', line)
-            line = re.sub(r' ([)!?”])', r'\1', line)
-            line = re.sub(r' ([.,;।’!?]’?”?’?\'?"?\)?]?”?|!+|\?+) ', r'\1 ', line)
-            line = re.sub(r' (can) (not) ', r' \1\2 ', line, flags=re.IGNORECASE)
-            line = re.sub(r" ([i’]) s ", "\1s ", line)
-            line = re.sub(r'(, ") ([a-z])', r'\1\2', line, flags=re.IGNORECASE)
-            line = re.sub(r"\b(are|ca|could|did|do|does|had|has|have|is|sha|should|was|were|wo|would) ?n['’]?t\b",
-                          r"\1n't", line, flags=re.IGNORECASE)
-        print(line.strip())
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes, 0 for one per CPU (default: 1)')
+    args = parser.parse_args()
+    # Wrap the binary streams directly and write output in chunks of lines rather than print() per line.
+    in_ = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', write_through=False, line_buffering=False)
+    chunks = iter(lambda: list(itertools.islice(in_, 4096)), [])
+    if args.jobs == 1:
+        for chunk in chunks:
+            out.write(''.join(process_lines(chunk)))
+    else:
+        # Lines are independent; imap (unlike imap_unordered) returns the processed chunks in input order.
+        with multiprocessing.Pool(args.jobs or None) as pool:
+            for out_lines in pool.imap(process_lines, chunks):
+                out.write(''.join(out_lines))
+    out.flush()
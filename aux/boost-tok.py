@@ -1,32 +1,107 @@
 #!/usr/bin/env python
 
 """This script re-tokenizes a few things, so that there is less clutter (fewer differences) in comparison
-with utoken. Usage: boost-tok.py < STDIN > STDOUT. Suitable for -b in colot-mt-diff.pl"""
+with utoken. Usage: boost-tok.py [-j JOBS] < STDIN > STDOUT. Suitable for -b in colot-mt-diff.pl"""
 
+import argparse
+import io
+import itertools
+import multiprocessing
 import re
-import regex
 import sys
+from typing import List
+try:
+    import re2  # optional (pip install google-re2): linear-time engine
+except ImportError:
+    re2 = re
+
+# re2 is used only for patterns that (1) have no \b, \s, \d, IGNORECASE (ASCII-only or different in re2) or \p{...}
+# (regex only) and (2) mostly scan without matching. Patterns that match often are faster with re, as each re2 match
+# has to cross the Python wrapper.
+# Rules that are fused into a single alternation never overlap with each other, so a single pass with
+# replace_loop_match/replace_contraction_match yields the same result as applying the rules one after another.
+re_loop_punct = re2.compile(r"(?P<exclamation>! !)|(?P<question>\? \?)"
+                            r"|(?P<left_guillemet>‹ ‹)|(?P<right_guillemet>› ›)"
+                            r"| @(?P<attach_left>(?:'+|:|’+|‘’|-+|\*|_|”|“|\"+|~|/|–+|‘+|\.\.+|\++|—+|`|&quot;)@?) ")
+re_attach_right_punct = re2.compile(r" ('+|:|’+|‘’|-+|\*|_|”|“|\"+|~|/|–+|‘+|\.\.+|\++|—+|`|&quot;)@ ")
+re_quote_pair = re.compile(r" (['’]) (['’]) ")
+re_final_quote_pair = re.compile(r" (['’]) (['’])$")
+re_split_clitic = re.compile(r" (['’]) (d|ll|m|re|s|ve)\b", flags=re.IGNORECASE)
+re_contraction = re.compile(r"\b(?P<negated_aux>(?P<aux>are|could|did|do|does|had|has|have|is|shall|should|was|were"
+                            r"|will|would)n (?P<aux_quote>['’])t)\b"
+                            r"|\b(?P<ca_nt>ca n(?P<ca_nt_quote>['’])t)\b"
+                            r"|\b(?P<can_t>can (?P<can_t_quote>['’])t)\b"
+                            r"|\b(?P<wo_nt>wo n(?P<wo_nt_quote>['’])t)\b"
+                            r"|\b(?P<won_t>won (?P<won_t_quote>['’])t)\b"
+                            r"|\b(?P<cannot>(?P<can>can)(?P<not>not))\b"
+                            r"| @-@ (?P<in_law>(?P<in>in) @-@ (?P<law>law))\b", flags=re.IGNORECASE)
+re_elided_article = re.compile(r"\b(d|l|n|s)\s+(['’])([^\W_])", flags=re.IGNORECASE)  # [^\W_]: letter or number
+
+
+def replace_loop_match(m: re.Match) -> str:
+    group = m.lastgroup
+    if group == 'exclamation':
+        return '!!'
+    elif group == 'question':
+        return '??'
+    elif group == 'left_guillemet':
+        return '‹‹'
+    elif group == 'right_guillemet':
+        return '››'
+    else:  # attach_left
+        return f' {m.group(group)} '
+
+
+def replace_contraction_match(m: re.Match) -> str:
+    group = m.lastgroup
+    if group == 'negated_aux':
+        return f"{m.group('aux')} n{m.group('aux_quote')}t"
+    elif group in ('ca_nt', 'can_t'):
+        return f"can n{m.group(group + '_quote')}t"
+    elif group in ('wo_nt', 'won_t'):
+        return f"will n{m.group(group + '_quote')}t"
+    elif group == 'cannot':
+        return f"{m.group('can')} {m.group('not')}"
+    else:  # in_law
+        return f"-{m.group('in')}-{m.group('law')}"
+
+
+def process_line(line: str) -> str:
+    """Re-tokenizes a single line."""
+    line = ' ' + line.strip() + ' '
+    for _ in range(2):
+        prev_line = line
+        line = re_loop_punct.sub(replace_loop_match, line)
+        line = re_attach_right_punct.sub(r" \1 ", line)
+        if line == prev_line:
+            break  # no change, so another pass would not change anything either
+    line = re_quote_pair.sub(r" \1\2 ", line)
+    line = re_final_quote_pair.sub(r" \1\2", line)
+    line = re_split_clitic.sub(r" \1\2", line)
+    line = re_contraction.sub(replace_contraction_match, line)
+    line = re_elided_article.sub(r"\1\2 \3", line)
+    return line.strip()
+
+
+def process_lines(lines: List[str]) -> List[str]:
+    return [process_line(line) + '\n' for line in lines]
+
 
 if __name__ == "__main__":
-    for line in sys.stdin:
-        line = ' ' + line.strip() + ' '
-        for _ in range(2):
-            line = re.sub('! !', '!!', line)
-            line = re.sub('\? \?', '??', line)
-            line = re.sub('‹ ‹', '‹‹', line)
-            line = re.sub('› ›', '››', line)
-            line = re.sub(r" @((?:'+|:|’+|‘’|-+|\*|_|”|“|\"+|~|/|–+|‘+|\.\.+|\++|—+|`|&quot;)@?) ", r" \1 ", line)
-            line = re.sub(r" ('+|:|’+|‘’|-+|\*|_|”|“|\"+|~|/|–+|‘+|\.\.+|\++|—+|`|&quot;)@ ", r" \1 ", line)
-        line = re.sub(r" (['’]) (['’]) ", r" \1\2 ", line)
-        line = re.sub(r" (['’]) (['’])$", r" \1\2", line)
-        line = re.sub(r" (['’]) (d|ll|m|re|s|ve)\b", r" \1\2", line, flags=re.IGNORECASE)
-        line = re.sub(r"\b(are|could|did|do|does|had|has|have|is|shall|should|was|were|will|would)n (['’])t\b",
-                      r"\1 n\2t", line, flags=re.IGNORECASE)
-        line = re.sub(r"\bca n(['’])t\b", r"can n\1t", line, flags=re.IGNORECASE)
-        line = re.sub(r"\bcan (['’])t\b", r"can n\1t", line, flags=re.IGNORECASE)
-        line = re.sub(r"\bwo n(['’])t\b", r"will n\1t", line, flags=re.IGNORECASE)
-        line = re.sub(r"\bwon (['’])t\b", r"will n\1t", line, flags=re.IGNORECASE)
-        line = re.sub(r"\b(can)(not)\b", r"\1 \2", line, flags=re.IGNORECASE)
-        line = re.sub(r" @-@ (in) @-@ (law)\b", r"-\1-\2", line, flags=re.IGNORECASE)
-        line = regex.sub(r"\b(d|l|n|s)\s+(['’])(\pL|\d)", r"\1\2 \3", line, flags=re.IGNORECASE)
-        print(line.strip())
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes, 0 for one per CPU (default: 1)')
+    args = parser.parse_args()
+    # Wrap the binary streams directly and write output in chunks of lines rather than print() per line.
+    in_ = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    out = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', write_through=False, line_buffering=False)
+    chunks = iter(lambda: list(itertools.islice(in_, 4096)), [])
+    if args.jobs == 1:
+        for chunk in chunks:
+            out.write(''.join(process_lines(chunk)))
+    else:
+        # Lines are independent; imap (unlike imap_unordered) returns the processed chunks in input order.
+        with multiprocessing.Pool(args.jobs or None) as pool:
+            for out_lines in pool.imap(process_lines, chunks):
+                out.write(''.join(out_lines))
+    out.flush()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # merge-utoken-data.py <anchor_filename> <new_filename> > STDOUT!!
 
+from collections import defaultdict
+import functools
 import logging as log
 import re
 import regex
@@ -9,19 +11,53 @@ from typing import Optional
 import unicodedata as ud
 
 
+class DiacriticDeletionTable(dict):
+    """str.translate table that deletes nonspacing marks (category Mn). Filled lazily, as building a full table
+    would cost more than a typical merge run."""
+    def __missing__(self, code_point: int) -> Optional[int]:
+        self[code_point] = value = None if ud.category(chr(code_point)) == 'Mn' else code_point
+        return value
+
+
+diacritic_deletion_table = DiacriticDeletionTable()
+
+
 def strip_diacritics(s):
-    return ''.join(c for c in ud.normalize('NFD', s)
-                   if ud.category(c) != 'Mn')
+    return ud.normalize('NFD', s).translate(diacritic_deletion_table)
 
 
-def slot_value_in_double_colon_del_list(s: str, slot: str, default: Optional[str] = None) -> str:
-    m = re.match(fr'(?:.*\s)?::{slot}(|\s+\S.*?)(?:\s+::\S.*|\s*)$', s)
-    return m.group(1).strip() if m else default
+re_slot_separator = re.compile(r'\s+(?=::\S)')
+re_slot = re.compile(r'::(\S+)(.*)$')
+re_head_slot_and_token = re.compile(r"::(\S+)\s+(\S|\S.*?\S)\s*(?::.*|)$")
+
+
+def double_colon_del_list_slots(s: str) -> dict:
+    """Maps all slots of a double-colon-delimited list to their values in a single scan, e.g.
+    '::lexical Capt. ::exp captain' -> {'lexical': 'Capt.', 'exp': 'captain'}
+    If a slot occurs more than once, the last value wins."""
+    slots = {}
+    for segment in re_slot_separator.split(s):
+        if m := re_slot.match(segment):
+            slots[m.group(1)] = m.group(2).strip()
+    return slots
 
 
 re_non_letters = regex.compile(r'\PL')
 
 
+group_key_slots = ('sem-class', 'taxon', 'token-category', 'tag', 'etym-lcode', 'problem')
+
+
+def group_key_string(group_key: tuple) -> str:
+    """(3, 'unit-of-measurement', None, None, None, None, None) ->
+    '003 ::sem-class unit-of-measurement ::taxon-none ::token-category-none ::tag-none ::etym-lcode-none ::problem-none'
+    Group keys are sorted by this string."""
+    head_slot_priority, *slot_values = group_key
+    return f'{head_slot_priority:03d}' + ''.join(f' ::{slot} {value}' if value else f' ::{slot}-none'
+                                                  for slot, value in zip(group_key_slots, slot_values))
+
+
+@functools.lru_cache(maxsize=None)
 def token_sort_function(s: str) -> str:
     """ removes non-letters, removes diacritics, lowers case; e.g. Capt. -> capt"""
     key1 = strip_diacritics(re_non_letters.sub('', s)).lower()
@@ -32,13 +68,14 @@ if __name__ == "__main__":
     log.basicConfig(level=log.INFO)
     # log.info(f'ARGV: {sys.argv}')
     token_sort_function('Capt.')
-    group_key_to_token_dict = {}
-    anchor_token_to_group_key_dict = {}
-    group_key_token_to_anchor_line_dict = {}
-    group_key_token_to_new_line_dict = {}
+    group_key_to_token_dict = defaultdict(list)
+    anchor_token_to_group_key_dict = defaultdict(list)
+    group_key_token_to_anchor_line_dict = defaultdict(lambda: defaultdict(list))
+    group_key_token_to_new_line_dict = defaultdict(lambda: defaultdict(list))
     dict_anchor_reverse = {}
     dict_new = {}
     head_slot_order = ['contraction', 'repair', 'punct-split', 'abbrev', 'lexical', 'misspelling']
+    head_slot_priority_dict = {head_slot: i for i, head_slot in enumerate(head_slot_order)}
     for file in ['anchor', 'new']:
         if file == 'anchor':
             filename = sys.argv[1]
@@ -51,67 +88,38 @@ if __name__ == "__main__":
             for line in f:
                 line = line.strip('\uFEFF\u000A\u000D')
                 line_number += 1
-                if m2 := re.match(r"::(\S+)\s+(\S|\S.*?\S)\s*(?::.*|)$", line):
+                if m2 := re_head_slot_and_token.match(line):
                     head_slot = m2.group(1)
                     token = m2.group(2)
-                    head_slot_priority = head_slot_order.index(head_slot) if head_slot in head_slot_order \
-                        else len(head_slot_order)
-                    group_key = f'{head_slot_priority:03d}'
-                    sub_group_p = False
-                    if sem_class := slot_value_in_double_colon_del_list(line, 'sem-class'):
-                        group_key += f' ::sem-class {sem_class}'
-                        sub_group_p = True
-                    else:
-                        group_key += ' ::sem-class-none'
-                    if taxon := slot_value_in_double_colon_del_list(line, 'taxon'):
-                        group_key += f' ::taxon {taxon}'
-                        sub_group_p = True
-                    else:
-                        group_key += ' ::taxon-none'
-                    if token_category := slot_value_in_double_colon_del_list(line, 'token-category'):
-                        group_key += f' ::token-category {token_category}'
-                        sub_group_p = True
-                    else:
-                        group_key += ' ::token-category-none'
-                    if tag := slot_value_in_double_colon_del_list(line, 'tag'):
-                        group_key += f' ::tag {tag}'
-                        sub_group_p = True
-                    else:
-                        group_key += ' ::tag-none'
-                    if etym_lcode := slot_value_in_double_colon_del_list(line, 'etym-lcode'):
-                        group_key += f' ::etym-lcode {etym_lcode}'
-                        sub_group_p = True
-                    else:
-                        group_key += ' ::etym-lcode-none'
-                    if problem := slot_value_in_double_colon_del_list(line, 'problem'):
-                        group_key += f' ::problem {problem}'
-                        sub_group_p = True
-                    else:
-                        group_key += ' ::problem-none'
-                    token_list = group_key_to_token_dict.get(group_key, [])
+                    head_slot_priority = head_slot_priority_dict.get(head_slot, len(head_slot_order))
+                    slots = double_colon_del_list_slots(line)
+                    group_key = (head_slot_priority, *(slots.get(slot) or None for slot in group_key_slots))
+                    sub_group_p = any(value is not None for value in group_key[1:])
                     if file == 'anchor':
-                        anchor_token_to_group_key_dict.setdefault(token, []).append(group_key)
-                        group_key_token_to_anchor_line_dict.setdefault(f'{group_key} {token}', []).append(line)
+                        anchor_token_to_group_key_dict[token].append(group_key)
+                        group_key_token_to_anchor_line_dict[group_key][token].append(line)
                     elif file == 'new':
                         if ((not sub_group_p)
                                 and (group_key_list := anchor_token_to_group_key_dict.get(token, None))):
                             group_key = group_key_list[0]
-                        group_key_token_to_new_line_dict.setdefault(f'{group_key} {token}', []).append(line)
-                    group_key_to_token_dict.setdefault(group_key, []).append(token)
+                        group_key_token_to_new_line_dict[group_key][token].append(line)
+                    group_key_to_token_dict[group_key].append(token)
                 elif line.strip() != '' and not line.startswith('#'):
                     log.info(f'L.{line_number}.{file} Missing :: at the beginning')
-    for group_key in sorted(group_key_to_token_dict.keys()):
+    for group_key in sorted(group_key_to_token_dict.keys(), key=group_key_string):
         # print(group_key)
-        for token in sorted(set(group_key_to_token_dict.get(group_key, None)), key=token_sort_function):
+        out_lines = []  # written per group rather than print() per line
+        for token in sorted(set(group_key_to_token_dict[group_key]), key=token_sort_function):
             # print(f'    {token}')
             last_anchor_line = ''
-            for anchor_line in group_key_token_to_anchor_line_dict.get(f'{group_key} {token}', []):
-                print(anchor_line)
+            for anchor_line in group_key_token_to_anchor_line_dict[group_key].get(token, []):
+                out_lines.append(anchor_line + '\n')
                 last_anchor_line = anchor_line + ' '
-            for new_line in group_key_token_to_new_line_dict.get(f'{group_key} {token}', []):
+            for new_line in group_key_token_to_new_line_dict[group_key].get(token, []):
                 if not last_anchor_line.startswith(new_line):
                     if new_line.startswith('::misspelling'):
-                        print(new_line)
+                        out_lines.append(new_line + '\n')
                     else:
-                        print('#' + new_line)
-        print()
+                        out_lines.append('#' + new_line + '\n')
+        out_lines.append('\n')
+        sys.stdout.write(''.join(out_lines))
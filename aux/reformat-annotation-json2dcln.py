@@ -4,11 +4,15 @@
 
 import json
 import sys
+try:
+    import ijson  # optional (pip install ijson): streams annotations rather than loading the whole file into memory
+except ImportError:
+    ijson = None
 
 
 if __name__ == "__main__":
     if True:
-        annotations = json.load(sys.stdin)
+        annotations = ijson.items(sys.stdin.buffer, 'item') if ijson else json.load(sys.stdin)
         annotation_number = 0
         for annotation in annotations:
             annotation_number += 1
@@ -3,70 +3,82 @@
 import logging as log
 import re
 import sys
-from typing import Optional
 
 
-def slot_value_in_double_colon_del_list(s: str, slot: str, default: Optional[str] = None) -> str:
-    m = re.match(fr'(?:.*\s)?::{slot}(|\s+\S.*?)(?:\s+::\S.*|\s*)$', s)
-    return m.group(1).strip() if m else default
+re_slot_separator = re.compile(r'\s+(?=::\S)')
+re_slot = re.compile(r'::(\S+)(.*)$')
+re_slot_name = re.compile(r'::([a-z]\S*)', re.IGNORECASE)
+
+
+def double_colon_del_list_slots(s: str) -> dict:
+    """Maps all slots of a double-colon-delimited list to their values in a single scan, e.g.
+    '::lexical Capt. ::exp captain' -> {'lexical': 'Capt.', 'exp': 'captain'}
+    If a slot occurs more than once, the last value wins."""
+    slots = {}
+    for segment in re_slot_separator.split(s):
+        if m := re_slot.match(segment):
+            slots[m.group(1)] = m.group(2).strip()
+    return slots
 
 
 if __name__ == "__main__":
     log.basicConfig(level=log.INFO)
     # print('START')
     line_number = 0
+    out_buf = []  # output lines are written in batches rather than print() per line
     for line in sys.stdin:
         line_number += 1
-        slots = set(re.findall(r'::([a-z]\S*)', line, re.IGNORECASE))
-        comment = slot_value_in_double_colon_del_list(line, 'comment')
-        lc = slot_value_in_double_colon_del_list(line, 'lc')
-        contraction = slot_value_in_double_colon_del_list(line, 'contraction')
-        norm = slot_value_in_double_colon_del_list(line, 'norm')
-        token = slot_value_in_double_colon_del_list(line, 'token')
-        abbreviation_expansion = slot_value_in_double_colon_del_list(line, 'abbreviation-expansion')
-        named_entity_type = slot_value_in_double_colon_del_list(line, 'named-entity-type')
-        type_value = slot_value_in_double_colon_del_list(line, 'type')
-        alt_spelling = slot_value_in_double_colon_del_list(line, 'alt-spelling')    # +hyphen
-        plural = slot_value_in_double_colon_del_list(line, 'plural')
-        misspelling = slot_value_in_double_colon_del_list(line, 'misspelling')
-        case_invariant = slot_value_in_double_colon_del_list(line, 'case-invariant')
-        left_context = slot_value_in_double_colon_del_list(line, 'left-context')
-        left_typed_context = slot_value_in_double_colon_del_list(line, 'left-typed-context')
-        right_context = slot_value_in_double_colon_del_list(line, 'right-context')
-        right_typed_context = slot_value_in_double_colon_del_list(line, 'right-typed-context')
-        etym_lc = slot_value_in_double_colon_del_list(line, 'etym-lc')
-        add_period_if_missing = slot_value_in_double_colon_del_list(line, 'add-period-if-missing')
-        suffix_variations = slot_value_in_double_colon_del_list(line, 'suffix-variations')
-        sem_class = slot_value_in_double_colon_del_list(line, 'sem-class')
-        token_category = slot_value_in_double_colon_del_list(line, 'token-category')
-        taxon = slot_value_in_double_colon_del_list(line, 'taxon')
-        currency_prefix = slot_value_in_double_colon_del_list(line, 'currency-prefix')
-        eng = slot_value_in_double_colon_del_list(line, 'eng')
+        slots = set(re_slot_name.findall(line))
+        slot_values = double_colon_del_list_slots(line)
+        comment = slot_values.get('comment')
+        lc = slot_values.get('lc')
+        contraction = slot_values.get('contraction')
+        norm = slot_values.get('norm')
+        token = slot_values.get('token')
+        abbreviation_expansion = slot_values.get('abbreviation-expansion')
+        named_entity_type = slot_values.get('named-entity-type')
+        type_value = slot_values.get('type')
+        alt_spelling = slot_values.get('alt-spelling')    # +hyphen
+        plural = slot_values.get('plural')
+        misspelling = slot_values.get('misspelling')
+        case_invariant = slot_values.get('case-invariant')
+        left_context = slot_values.get('left-context')
+        left_typed_context = slot_values.get('left-typed-context')
+        right_context = slot_values.get('right-context')
+        right_typed_context = slot_values.get('right-typed-context')
+        etym_lc = slot_values.get('etym-lc')
+        add_period_if_missing = slot_values.get('add-period-if-missing')
+        suffix_variations = slot_values.get('suffix-variations')
+        sem_class = slot_values.get('sem-class')
+        token_category = slot_values.get('token-category')
+        taxon = slot_values.get('taxon')
+        currency_prefix = slot_values.get('currency-prefix')
+        eng = slot_values.get('eng')
 
         if line.startswith('::token ') or line.startswith('::misspelling ') or line.startswith('::currency-prefix '):
             if line.startswith('::currency-prefix'):
-                out = f'::abbrev {currency_prefix}'
+                parts = [f'::abbrev {currency_prefix}']
                 if abbreviation_expansion:
-                    out += f' ::exp {abbreviation_expansion}'
+                    parts.append(f'::exp {abbreviation_expansion}')
                 else:
                     log.info(f'L.{line_number} ::currency-prefix without ::abbreviation-expansion')
-                out += " ::token-category prefix"
+                parts.append("::token-category prefix")
                 if token_category or (type_value and type_value != 'unit'):
                     log.info(f'L.{line_number} ::currency-prefix includes explicit ::type or ::token-category')
             elif abbreviation_expansion:
-                out = f'::abbrev {token} ::exp {abbreviation_expansion}'
+                parts = [f'::abbrev {token} ::exp {abbreviation_expansion}']
             elif line.startswith('::misspelling'):
-                out = f'::misspelling {misspelling}'
+                parts = [f'::misspelling {misspelling}']
                 if norm:
-                    out += f' ::target {norm}'
+                    parts.append(f'::target {norm}')
                 else:
                     log.info(f'L.{line_number} ::misspelling without ::norm')
             else:
-                out = f'::lexical {token}'
+                parts = [f'::lexical {token}']
             if lc:
-                out += f' ::lcode {lc}'
+                parts.append(f'::lcode {lc}')
             if etym_lc:
-                out += f' ::etym-lcode {etym_lc}'
+                parts.append(f'::etym-lcode {etym_lc}')
             if named_entity_type:
                 if sem_class:
                     log.info(f"L.{line_number} Duplicate sem-class by named-entity-type '{named_entity_type}'")
@@ -80,7 +92,7 @@ if __name__ == "__main__":
                 else:
                     sem_class = named_entity_type
                     log.info(f"L.{line_number} Unknown named-entity-type '{named_entity_type}'")
-                out += f' ::sem-class {sem_class}'
+                parts.append(f'::sem-class {sem_class}')
             if type_value:
                 if sem_class:
                     log.info(f"L.{line_number} Duplicate sem-class by type '{type_value}'")
@@ -97,39 +109,43 @@ if __name__ == "__main__":
                     sem_class = type_value
                     log.info(f"L.{line_number} Unknown type '{type}'")
                 if token_category:
-                    out += f' ::token-category {token_category}'
+                    parts.append(f'::token-category {token_category}')
                 if sem_class:
-                    out += f' ::sem-class {sem_class}'
+                    parts.append(f'::sem-class {sem_class}')
             if taxon:
-                out += f' ::taxon {taxon}'
+                parts.append(f'::taxon {taxon}')
             if case_invariant is not None:
-                out += ' ::case-sensitive True'
+                parts.append('::case-sensitive True')
             if left_context:
-                out += f' ::left-context {left_context}'
+                parts.append(f'::left-context {left_context}')
             if left_typed_context:
-                out += f' ::left-types-context {left_typed_context}'
+                parts.append(f'::left-types-context {left_typed_context}')
             if right_context:
-                out += f' ::right-context {right_context}'
+                parts.append(f'::right-context {right_context}')
             if right_typed_context:
-                out += f' ::right-types-context {right_typed_context}'
+                parts.append(f'::right-types-context {right_typed_context}')
             if add_period_if_missing:
-                out += f' ::add-period-if-missing {add_period_if_missing}'
+                parts.append(f'::add-period-if-missing {add_period_if_missing}')
             if plural:
-                out += f' ::plural {plural}'
+                parts.append(f'::plural {plural}')
             if alt_spelling:
-                out += f' ::alt-spelling {alt_spelling}'
+                parts.append(f'::alt-spelling {alt_spelling}')
             if misspelling and not line.startswith('::misspelling'):
-                out += f' ::misspelling {misspelling}'
+                parts.append(f'::misspelling {misspelling}')
             if suffix_variations:
-                out += f' ::suffix-variations {suffix_variations}'
+                parts.append(f'::suffix-variations {suffix_variations}')
             if comment:
-                out += f' ::comment {comment}'
+                parts.append(f'::comment {comment}')
             if eng:
-                out += f' ::eng {eng}'
+                parts.append(f'::eng {eng}')
             if extras := (slots - {'token', 'lc', 'case-invariant', 'abbreviation-expansion', 'comment',
                                    'add-period-if-missing', 'alt-spelling', 'misspelling', 'misspelling-type',
                                    'etym-lc', 'suffix-variations', 'norm', 'eng',
                                    'named-entity-type', 'plural', 'taxon', 'type', 'currency-prefix',
                                    'left-context', 'left-typed-context', 'right-context', 'right-typed-context'}):
                 log.warning(f'L.{line_number} abbreviation entry has unknown slots: {extras}')
-            print(out)
+            out_buf.append(' '.join(parts) + '\n')
+            if len(out_buf) >= 4096:
+                sys.stdout.write(''.join(out_buf))
+                out_buf.clear()
+    sys.stdout.write(''.join(out_buf))
@@ -3,43 +3,31 @@
 """Script analyzes a tokenization annotation for a range of suspicious tokens."""
 
 from collections import defaultdict
-import functools
 import json
 import logging as log
 import regex
 import sys
 from typing import Optional, TextIO
+try:
+    import ijson  # optional (pip install ijson): streams annotations rather than loading the whole file into memory
+except ImportError:
+    ijson = None
 
 
 log.basicConfig(level=log.INFO)
 
 
-class TokenizationAnomaly:
-    def __init__(self, s: str):
-        self.s = s
-        self.count = 0
-        self.locations = []
-
-    @staticmethod
-    def register_anomaly(surf: str, loc: str, anomaly_dict: dict) -> None:
-        anomaly_entry: TokenizationAnomaly = anomaly_dict.get(surf, None)
-        if not anomaly_entry:
-            anomaly_entry = TokenizationAnomaly(surf)
-            anomaly_dict[surf] = anomaly_entry
-        anomaly_entry.count += 1
-        anomaly_entry.locations.append(loc)
-
-
 class TokenizationAnalysis:
     def __init__(self, lcode: Optional[str] = None):
         self.lcode = lcode
         self.token_count = defaultdict(int)
-        self.case_anomalies = {}
-        self.letter_punct_anomalies = {}
-        self.letter_number_anomalies = {}
-        self.letters_wo_period_anomalies = {}
-        self.pre_number_anomalies = {}
-        self.post_number_anomalies = {}
+        # anomaly dicts map a surface string to the list of its locations (sentence IDs), one per instance
+        self.case_anomalies = defaultdict(list)
+        self.letter_punct_anomalies = defaultdict(list)
+        self.letter_number_anomalies = defaultdict(list)
+        self.letters_wo_period_anomalies = defaultdict(list)
+        self.pre_number_anomalies = defaultdict(list)
+        self.post_number_anomalies = defaultdict(list)
 
     re_lower_upper = regex.compile(r'.*\p{Ll}\pM*\p{Lu}', flags=regex.V1)
     re_contains_letter = regex.compile(r'.*\pL', flags=regex.V1)
@@ -47,9 +35,24 @@ class TokenizationAnalysis:
     re_contains_punct = regex.compile(r'.*\pP', flags=regex.V1)
     re_contains_number = regex.compile(r'.*\pN', flags=regex.V1)
     re_span_components = regex.compile(r'(\d+)-(\d+)$')
+    # exceptions and helpers for the anomaly checks in analyze_tokenization
+    re_mac_name = regex.compile(r'Ma?c\p{Lu}\p{Ll}+$')
+    re_letter_punct_ok = regex.compile(r"(?:\p{Lu}\.|'n'|@?&quot;@?)$")
+    re_letters_and_apostrophes = regex.compile(r"(?:\pL\pM*|['’])+$")
+    re_pre_number_ok_left_context = regex.compile(r'.*(?:[ (\[$£]| ["”]|\bRMB|\bRs\.|<.*">|No\.)$')
+    re_post_number_ok_right_context = regex.compile(r"(?:(?:%|\+|st|nd|rd|th|[kKM])?[\"”]?[_.,;!?:\)\]]?[\"”]? |"
+                                                    r"[-:/]\d|'s|[)\]]|<\/)")
+    re_digits = regex.compile(r'\d+$')
+    re_mt_punct = regex.compile(r'@?[-:/]@?$')
+    re_first_space_to_end = regex.compile(r'\s.*$')
+    re_up_to_last_space = regex.compile(r'.*\s')
+    re_ascii_digit = regex.compile(r'[0-9]')
 
     def analyze_tokenization(self, input_file: TextIO) -> None:
-        annotations = json.load(input_file)
+        if ijson and hasattr(input_file, 'buffer'):
+            annotations = ijson.items(input_file.buffer, 'item')
+        else:
+            annotations = json.load(input_file)
         n_annotations = 0
         snt_id = None
         snt = None
@@ -63,11 +66,11 @@ class TokenizationAnalysis:
                 left_surf1, left_surf2 = '', ''
                 for chart_element in chart_elements:
                     span = chart_element.get('span', None)
+                    # Left/right contexts are only sliced out of snt for the (few) tokens that need them.
                     if m2 := self.re_span_components.match(span):
-                        left_context = ' ' + snt[0:int(m2.group(1))]
-                        right_context = snt[int(m2.group(2)):] + ' '
+                        start, end = map(int, m2.groups())
                     else:
-                        left_context, right_context = ' ', ' '
+                        start, end = None, None
                     surf = chart_element.get('surf', None)
                     self.token_count[surf] += 1
                     tokenization_type = chart_element.get('type', None)
@@ -76,35 +79,36 @@ class TokenizationAnalysis:
                             and tokenization_type not in ('ABBREV', 'ABBREV-P', 'ABBREV-PP',
                                                           'DECONTRACTION', 'DECONTRACTION-L', 'DECONTRACTION-R',
                                                           'HASHTAG', 'LEXICAL', 'REPAIR'):
-                        if self.re_lower_upper.match(surf) \
-                                and not regex.match(r'Ma?c\p{Lu}\p{Ll}+$', surf):
-                            TokenizationAnomaly.register_anomaly(surf, snt_id, self.case_anomalies)
-                        if self.re_contains_letter.match(surf) and self.re_contains_punct.match(surf) \
-                                and not regex.match(r"(?:\p{Lu}\.|'n'|@?&quot;@?)$", surf)\
+                        # Tokens without any letter (numbers, punctuation) can't match the first four checks.
+                        contains_letter = self.re_contains_letter.match(surf)
+                        if contains_letter and self.re_lower_upper.match(surf) \
+                                and not self.re_mac_name.match(surf):
+                            self.case_anomalies[surf].append(snt_id)
+                        if contains_letter and self.re_contains_punct.match(surf) \
+                                and not self.re_letter_punct_ok.match(surf) \
                                 and not (self.lcode in ('asm', 'heb', 'som', 'tgl')
-                                         and regex.match(r"(?:\pL\pM*|['’])+$", surf)):
-                            TokenizationAnomaly.register_anomaly(surf, snt_id, self.letter_punct_anomalies)
-                        if self.re_contains_letter.match(surf) and self.re_contains_number.match(surf):
-                            TokenizationAnomaly.register_anomaly(surf, snt_id, self.letter_number_anomalies)
-                        if len(surf) <= 4 and self.re_ends_w_letter.match(surf) and right_context.startswith('.'):
-                            right_context_token = regex.sub(r'\s.*$', '', right_context)
-                            TokenizationAnomaly.register_anomaly(surf + ' ' + right_context_token,
-                                                                 snt_id, self.letters_wo_period_anomalies)
+                                         and self.re_letters_and_apostrophes.match(surf)):
+                            self.letter_punct_anomalies[surf].append(snt_id)
+                        if contains_letter and self.re_contains_number.match(surf):
+                            self.letter_number_anomalies[surf].append(snt_id)
+                        if contains_letter and len(surf) <= 4 and end is not None and snt.startswith('.', end) \
+                                and self.re_ends_w_letter.match(surf):
+                            right_context = snt[end:] + ' '
+                            right_context_token = self.re_first_space_to_end.sub('', right_context)
+                            self.letters_wo_period_anomalies[surf + ' ' + right_context_token].append(snt_id)
                         if tokenization_type in ('NUMBER', 'NUMBER-2', 'NUMBER-B'):
-                            if not regex.match(r'.*(?:[ (\[$£]| ["”]|\bRMB|\bRs\.|<.*">|No\.)$', left_context) \
-                                    and not (regex.match(r'\d+$', left_surf2)
-                                             and regex.match(r'@?[-:/]@?$', left_surf1)):
-                                left_context_token = regex.sub(r'.*\s', '', left_context)
-                                token_pattern = regex.sub(r'[0-9]', 'd', surf)
-                                TokenizationAnomaly.register_anomaly(left_context_token + ' ' + token_pattern,
-                                                                     snt_id, self.pre_number_anomalies)
-                            if not regex.match(r"(?:(?:%|\+|st|nd|rd|th|[kKM])?[\"”]?[_.,;!?:\)\]]?[\"”]? |"
-                                               r"[-:/]\d|'s|[)\]]|<\/)",
-                                               right_context):
-                                right_context_token = regex.sub(r'\s.*$', '', right_context)
-                                token_pattern = regex.sub(r'[0-9]', 'd', surf)
-                                TokenizationAnomaly.register_anomaly(token_pattern + ' ' + right_context_token,
-                                                                     snt_id, self.post_number_anomalies)
+                            left_context = ' ' if start is None else ' ' + snt[0:start]
+                            right_context = ' ' if end is None else snt[end:] + ' '
+                            if not self.re_pre_number_ok_left_context.match(left_context) \
+                                    and not (self.re_digits.match(left_surf2)
+                                             and self.re_mt_punct.match(left_surf1)):
+                                left_context_token = self.re_up_to_last_space.sub('', left_context)
+                                token_pattern = self.re_ascii_digit.sub('d', surf)
+                                self.pre_number_anomalies[left_context_token + ' ' + token_pattern].append(snt_id)
+                            if not self.re_post_number_ok_right_context.match(right_context):
+                                right_context_token = self.re_first_space_to_end.sub('', right_context)
+                                token_pattern = self.re_ascii_digit.sub('d', surf)
+                                self.post_number_anomalies[token_pattern + ' ' + right_context_token].append(snt_id)
                     left_surf2, left_surf1 = left_surf1, surf
         log.info(f'Processed {n_annotations} annotations.')
 
@@ -118,19 +122,6 @@ class TokenizationAnalysis:
         else:
             return s + 's'
 
-    @staticmethod
-    def compare_anomalies(a1: TokenizationAnomaly, a2: TokenizationAnomaly):
-        if diff := a2.count - a1.count:
-            return diff
-        lc_s1 = a1.s.lower()
-        lc_s2 = a2.s.lower()
-        if lc_s1 > lc_s2:
-            return 1
-        elif lc_s2 > lc_s1:
-            return -1
-        else:
-            return 0
-
     def print_tokenization_analysis(self) -> None:
         dicts = (self.case_anomalies, self.letter_punct_anomalies, self.letter_number_anomalies,
                  self.letters_wo_period_anomalies, self.pre_number_anomalies, self.post_number_anomalies)
@@ -138,14 +129,12 @@ class TokenizationAnalysis:
                    'pre-number', 'post-number')
         for i in range(len(dicts)):
             print('###', legends[i])
-            anomalies = list(dicts[i].values())
-            anomalies.sort(key=functools.cmp_to_key(self.compare_anomalies))
-            for anomaly in anomalies:
-                count = anomaly.count
-                s = anomaly.s
+            anomalies = sorted(dicts[i].items(), key=lambda item: (-len(item[1]), item[0].lower()))
+            for s, locations in anomalies:
+                count = len(locations)
                 token_count_clause = ''
-                if dicts[i] == self.letters_wo_period_anomalies:
-                    token = regex.sub(r'\s.*$', '', s)
+                if dicts[i] is self.letters_wo_period_anomalies:
+                    token = self.re_first_space_to_end.sub('', s)
                     token_count = self.token_count.get(token, 0)
                     if count < 0.4 * token_count:
                         # log.info(f'  skipping letters_wo_period_anomalies for {s} ({count}/{token_count})')
@@ -153,7 +142,6 @@ class TokenizationAnalysis:
                     else:
                         token_count_clause = f' #{token_count}'
                 instance_s = self.reg_plural('instance', count)
-                locations = anomaly.locations
                 if len(locations) > 12:
                     locations[10:] = ['ETC']
                 location_s = ' '.join(locations)
@@ -9,16 +9,40 @@
 """
 
 from shutil import copyfile
+import concurrent.futures
 import difflib
+import filecmp
+import io
 import logging as log
+import mmap
 from pathlib import Path
 import os
 import re
 import subprocess
 import sys
-from typing import List
+from typing import Iterator, List, Tuple, Union
+try:
+    # optional (pip install cdifflib): C implementation of difflib.SequenceMatcher, also picked up by difflib.ndiff
+    from cdifflib import CSequenceMatcher
+    difflib.SequenceMatcher = CSequenceMatcher
+except ImportError:
+    pass
+try:
+    # optional (pip install diff-match-patch): Myers line diff, much faster than difflib on very large blocks
+    from diff_match_patch import diff_match_patch
+except ImportError:
+    diff_match_patch = None
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
 
 log.basicConfig(level=log.INFO)
+re_version_arg = re.compile(r'-*v\d+(\.\d+)(\.\d+)$')
+re_lang_code_suffix = re.compile(r'\.[a-z]{3}$')
+file_buffer_size = 1 << 18  # 256 KiB rather than the default 8 KiB, for fewer read calls on large files
+FICLONE = 0x40049409  # ioctl request from linux/fs.h
+large_block_threshold = 2000  # lines in both .dcln blocks; larger blocks are diffed with diff_match_patch, if available
 
 
 class Bcolors:
@@ -33,20 +57,198 @@ class Bcolors:
     UNDERLINE = '\033[4m'
 
 
-def read_sentence_block_from_dcln_file(file: Path) -> List[str]:
-    sentence_block_list = []
-    block = ''
-    with open(file) as f:
+class MidpointDiffer(difflib.Differ):
+    """difflib.Differ that breaks ties between equally similar line pairs in _fancy_replace by picking the pair
+    closest to the middle of both line ranges (instead of the first one). Synching near the middle splits the
+    ranges in half, avoiding the deep recursion and cubic runtime of blocks with many near-identical lines.
+    Python 3.14+ difflib has its own fix (CPython gh-119105)."""
+    def _fancy_replace(self, a, alo, ahi, b, blo, bhi):
+        # don't synch up unless the lines have a similarity score of at least cutoff;
+        # best_ratio_weight tracks the best (score, closeness to range midpoints) seen so far
+        best_ratio_weight, cutoff = (0.74, float('-inf')), 0.75
+        best_i, best_j = None, None
+        cruncher = difflib.SequenceMatcher(self.charjunk)
+        eqi, eqj = None, None   # 1st indices of equal lines (if any)
+        amid, bmid = (alo + ahi - 1) / 2, (blo + bhi - 1) / 2
+        for j in range(blo, bhi):
+            bj = b[j]
+            cruncher.set_seq2(bj)
+            for i in range(alo, ahi):
+                ai = a[i]
+                if ai == bj:
+                    if eqi is None:
+                        eqi, eqj = i, j
+                    continue
+                cruncher.set_seq1(ai)
+                # cheap upper bounds first; ratio() is cached by cruncher
+                best_ratio = best_ratio_weight[0]
+                if cruncher.real_quick_ratio() >= best_ratio and cruncher.quick_ratio() >= best_ratio:
+                    ratio_weight = (cruncher.ratio(), -abs(i - amid) - abs(j - bmid))
+                    if ratio_weight > best_ratio_weight:
+                        best_ratio_weight, best_i, best_j = ratio_weight, i, j
+        best_ratio = best_ratio_weight[0]
+        if best_ratio < cutoff:
+            # no non-identical "pretty close" pair
+            if eqi is None:
+                # no identical pair either -- treat it as a straight replace
+                yield from self._plain_replace(a, alo, ahi, b, blo, bhi)
+                return
+            # no close pair, but an identical pair -- synch up on that
+            best_i, best_j, best_ratio = eqi, eqj, 1.0
+        else:
+            # there's a close pair, so forget the identical pair (if any)
+            eqi = None
+
+        # pump out diffs from before the synch point
+        yield from self._fancy_helper(a, alo, best_i, b, blo, best_j)
+
+        # do intraline marking on the synch pair
+        aelt, belt = a[best_i], b[best_j]
+        if eqi is None:
+            # pump out a '-', '?', '+', '?' quad for the synched lines
+            atags = btags = ""
+            cruncher.set_seqs(aelt, belt)
+            for tag, ai1, ai2, bj1, bj2 in cruncher.get_opcodes():
+                la, lb = ai2 - ai1, bj2 - bj1
+                if tag == 'replace':
+                    atags += '^' * la
+                    btags += '^' * lb
+                elif tag == 'delete':
+                    atags += '-' * la
+                elif tag == 'insert':
+                    btags += '+' * lb
+                elif tag == 'equal':
+                    atags += ' ' * la
+                    btags += ' ' * lb
+                else:
+                    raise ValueError('unknown tag %r' % (tag,))
+            yield from self._qformat(aelt, belt, atags, btags)
+        else:
+            # the synch pair is identical
+            yield '  ' + aelt
+
+        # pump out diffs from after the synch point
+        yield from self._fancy_helper(a, best_i+1, ahi, b, best_j+1, bhi)
+
+
+def large_block_compare(a: List[str], b: List[str]) -> Iterator[str]:
+    """Line diff of a and b with diff_match_patch, in the format of difflib.Differ.compare, but without '?' lines."""
+    dmp = diff_match_patch()
+    dmp.Diff_Timeout = 2.0  # seconds; after that, the rest is reported as a plain delete/insert
+    chars1, chars2, line_array = dmp.diff_linesToChars(''.join(f'{line}\n' for line in a),
+                                                       ''.join(f'{line}\n' for line in b))
+    diffs = dmp.diff_main(chars1, chars2, False)
+    dmp.diff_cleanupSemantic(diffs)
+    dmp.diff_charsToLines(diffs, line_array)
+    prefixes = {dmp.DIFF_DELETE: '- ', dmp.DIFF_INSERT: '+ ', dmp.DIFF_EQUAL: '  '}
+    for op, text in diffs:
+        prefix = prefixes[op]
+        for line in text.splitlines():
+            yield prefix + line
+
+
+def iter_sentence_blocks(file: Union[Path, str]) -> Iterator[List[str]]:
+    """Yields the blocks of a .dcln file, each starting with a ::line line, one at a time as a list of lines."""
+    parts = []
+    with open(file, buffering=file_buffer_size, encoding='utf-8') as f:
         for line in f:
-            if line.startswith('::line'):
-                if block != '':
-                    sentence_block_list.append(block)
-                block = line
+            if line.startswith('::line') and parts:
+                yield parts
+                parts = [line]
             else:
-                block += line
-        if block != '':
-            sentence_block_list.append(block)
-    return sentence_block_list
+                parts.append(line)
+    if parts:
+        yield parts
+
+
+def count_lines(file: Union[Path, str], block_size: int = 1 << 20) -> int:
+    """Returns the number of lines that iterating over the file in text mode yields (universal newlines: \n, \r\n
+    and \r all end a line), but counted on the raw bytes, block by block."""
+    n_lines = 0
+    last_byte = b''
+    with open(file, 'rb', buffering=0) as f:
+        while block := f.read(block_size):
+            n_lines += block.count(b'\n') + block.count(b'\r') - block.count(b'\r\n')
+            if last_byte == b'\r' and block.startswith(b'\n'):  # \r\n split across blocks
+                n_lines -= 1
+            last_byte = block[-1:]
+    if last_byte not in (b'', b'\n', b'\r'):  # last line without line ending
+        n_lines += 1
+    return n_lines
+
+
+def compare_lines(file1: Union[Path, str], file2: Union[Path, str], block_size: int = 1 << 20) -> Tuple[int, int]:
+    """Returns the number of lines compared (up to the end of the shorter file) and the number of differing lines.
+    Both files are memory-mapped; leading blocks that are equal are compared and their lines counted as bytes;
+    lines are decoded and compared one by one only from the line containing the first difference
+    (or any \r, to keep universal newline semantics)."""
+    n_lines = 0
+    n_diff_lines = 0
+    with open(file1, 'rb', buffering=file_buffer_size) as f1, open(file2, 'rb', buffering=file_buffer_size) as f2:
+        line_start = 0  # file position of the first line not yet counted
+        if size := min(os.fstat(f1.fileno()).st_size, os.fstat(f2.fileno()).st_size):  # (can't mmap empty files)
+            with mmap.mmap(f1.fileno(), 0, access=mmap.ACCESS_READ) as m1, \
+                    mmap.mmap(f2.fileno(), 0, access=mmap.ACCESS_READ) as m2:
+                for block_start in range(0, size, block_size):
+                    b1 = m1[block_start:block_start + block_size]
+                    if b1 != m2[block_start:block_start + block_size] or b'\r' in b1:
+                        break
+                    if (last_newline := b1.rfind(b'\n')) >= 0:
+                        n_lines += b1.count(b'\n')
+                        line_start = block_start + last_newline + 1
+        f1.seek(line_start)
+        f2.seek(line_start)
+        for line1, line2 in zip(io.TextIOWrapper(f1, encoding='utf-8'), io.TextIOWrapper(f2, encoding='utf-8')):
+            n_lines += 1
+            if line1 != line2:
+                n_diff_lines += 1
+    return n_lines, n_diff_lines
+
+
+def count_sentence_blocks_in_dcln_file(file: Union[Path, str]) -> int:
+    """Number of blocks that iter_sentence_blocks(file) yields, but without building them."""
+    n_blocks = 0
+    with open(file, buffering=file_buffer_size, encoding='utf-8') as f:
+        for line_number, line in enumerate(f):
+            if line.startswith('::line') or line_number == 0:
+                n_blocks += 1
+    return n_blocks
+
+
+def fast_copy(src: str, dst: str) -> None:
+    """Copies src to dst as a copy-on-write clone (reflink), which shares the data blocks instead of copying them,
+    where the file system supports it (Linux btrfs, XFS etc.); otherwise with shutil.copyfile
+    (which in turn uses sendfile on Linux and fcopyfile on macOS)."""
+    if fcntl is not None and sys.platform.startswith('linux'):
+        try:
+            with open(src, 'rb') as f_src, open(dst, 'wb') as f_dst:
+                fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+            return
+        except OSError:
+            pass
+    copyfile(src, dst)
+
+
+def compare_files(save_filename: str, filename: str) -> Tuple[int, int]:
+    """Returns the number of lines (sentence blocks for .dcln files) compared and the number of differing ones.
+    Module-level, so that it can be run in worker processes."""
+    n_lines = 0
+    n_diff_lines = 0
+    if filecmp.cmp(save_filename, filename, shallow=False):
+        # identical files (the common case) need no line-by-line comparison
+        if filename.endswith('.dcln'):
+            n_lines = count_sentence_blocks_in_dcln_file(filename)
+        else:
+            n_lines = count_lines(filename)
+    elif filename.endswith('tok'):  # .tok or .detok
+        n_lines, n_diff_lines = compare_lines(save_filename, filename)
+    elif filename.endswith('.dcln'):
+        for sentence_block1, sentence_block2 in zip(iter_sentence_blocks(save_filename),
+                                                    iter_sentence_blocks(filename)):
+            n_lines += 1
+            if sentence_block1 != sentence_block2:
+                n_diff_lines += 1
+    return n_lines, n_diff_lines
 
 
 if __name__ == "__main__":
@@ -66,21 +268,21 @@ if __name__ == "__main__":
     for arg in sys.argv[1:]:
         path = Path(arg)
         if path.is_file():
-            if re.match(r'.*\.tok$', arg):
+            if arg.endswith('.tok'):
                 tok_filenames.append(path)
-            elif re.match(r'.*\.detok$', arg):
+            elif arg.endswith('.detok'):
                 detok_filenames.append(path)
-            elif re.match(r'.*\.dcln$', arg):
+            elif arg.endswith('.dcln'):
                 dcln_filenames.append(path)
             else:
                 log.warning(f'Invalid arg {arg} Filename should be *.tok or *.dcln')
         elif path.is_dir():
             directories.append(path)
-        elif re.match(r'-+u', arg):
+        elif arg.startswith('-') and arg.lstrip('-').startswith('u'):
             update_p = True
-        elif re.match(r'-+[dr]', arg):  # d as in detokenize, r as in reverse
+        elif arg.startswith('-') and arg.lstrip('-').startswith(('d', 'r')):  # d as in detokenize, r as in reverse
             detok_p = True
-        elif re.match(r'-*v\d+(\.\d+)(\.\d+)$', arg):
+        elif re_version_arg.match(arg):
             new_version = arg.lstrip('-')
         else:
             log.warning(f'Invalid arg {arg}')
@@ -93,94 +295,110 @@ if __name__ == "__main__":
     # if dcln_filenames:
     #     log.info(f'filenames: {dcln_filenames}')
     n_updates = 0
+    # The files of a directory are compared in parallel (worker processes are only started once needed);
+    # results come back in input order and are reported, and any files copied, in the main process.
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count())
     for directory in directories:
-        if detok_p:
-            filenames = list(directory.glob('*.detok'))
+        # A single scandir per directory; existence checks are then set lookups rather than a stat call each.
+        try:
+            with os.scandir(directory) as entries:
+                present = {entry.name for entry in entries if entry.is_file()}
+        except (FileNotFoundError, NotADirectoryError):  # e.g. a default directory that does not exist
+            continue
+        suffixes = ('.detok',) if detok_p else ('.tok', '.dcln')
+        filename_strings = []
+        save_filenames = []
+        for name in sorted(name for name in present if name.endswith(suffixes)):
+            if name + '~save' in present:
+                filename_s = os.fspath(directory / name)  # for the suffix tests and derived filenames
+                filename_strings.append(filename_s)
+                save_filenames.append(filename_s + '~save')
+        if len(filename_strings) > 1:
+            results = executor.map(compare_files, save_filenames, filename_strings, chunksize=8)
         else:
-            filenames = list(directory.glob('*.tok')) + list(directory.glob('*.dcln'))
-        filenames.sort()
-        for filename in filenames:
-            save_filename = Path(str(filename) + '~save')
-            if save_filename.is_file():
-                save_filename2 = Path(str(filename) + '~save2')
-                rel_filename = Path(os.path.relpath(filename, cwd))
-                n_lines = 0
-                n_diff_lines = 0
-                if str(filename).endswith('tok'):  # .tok or .detok
-                    with open(save_filename) as f1, open(filename) as f2:
-                        for line1, line2 in zip(f1, f2):
-                            n_lines += 1
-                            if line1 != line2:
-                                n_diff_lines += 1
-                elif str(filename).endswith('.dcln'):
-                    sentence_block_list1 = read_sentence_block_from_dcln_file(save_filename)
-                    sentence_block_list2 = read_sentence_block_from_dcln_file(filename)
-                    for sentence_block1, sentence_block2 in zip(sentence_block_list1, sentence_block_list2):
-                        n_lines += 1
-                        if sentence_block1 != sentence_block2:
-                            n_diff_lines += 1
-                if n_diff_lines:
-                    if update_p:
-                        print(f"{Bcolors.WARNING}{rel_filename} {n_diff_lines}/{n_lines} lines differ{Bcolors.ENDC}")
-                        copyfile(save_filename, save_filename2)
-                        copyfile(filename, save_filename)
-                        n_updates += 1
-                    else:
-                        print(f'{Bcolors.FAIL}{rel_filename} {n_diff_lines}/{n_lines} lines differ{Bcolors.ENDC}')
-                elif new_version:
-                    pass
+            results = map(compare_files, save_filenames, filename_strings)
+        for filename_s, save_filename, (n_lines, n_diff_lines) in zip(filename_strings, save_filenames, results):
+            save_filename2 = filename_s + '~save2'
+            rel_filename = Path(os.path.relpath(filename_s, cwd))
+            if n_diff_lines:
+                if update_p:
+                    print(f"{Bcolors.WARNING}{rel_filename} {n_diff_lines}/{n_lines} lines differ{Bcolors.ENDC}")
+                    os.replace(save_filename, save_filename2)  # rename rather than copy; ~save is re-created next
+                    fast_copy(filename_s, save_filename)
+                    n_updates += 1
                 else:
-                    print(f'{Bcolors.OKGREEN}{rel_filename} {n_diff_lines}/{n_lines} lines differ{Bcolors.ENDC}')
-                if new_version:
-                    version_filename = Path(str(filename) + f'.{new_version}')
-                    if version_filename.is_file():
-                        print(f'{Bcolors.FAIL}Warning: {version_filename} already exists. Not saved.{Bcolors.ENDC}')
-                    else:
-                        copyfile(filename, version_filename)
-                        print(f'{Bcolors.OKGREEN}Saved as {version_filename}{Bcolors.ENDC}')
+                    print(f'{Bcolors.FAIL}{rel_filename} {n_diff_lines}/{n_lines} lines differ{Bcolors.ENDC}')
+            elif new_version:
+                pass
+            else:
+                print(f'{Bcolors.OKGREEN}{rel_filename} {n_diff_lines}/{n_lines} lines differ{Bcolors.ENDC}')
+            if new_version:
+                version_filename = f'{filename_s}.{new_version}'
+                if os.path.basename(version_filename) in present:
+                    print(f'{Bcolors.FAIL}Warning: {version_filename} already exists. Not saved.{Bcolors.ENDC}')
+                else:
+                    fast_copy(filename_s, version_filename)
+                    print(f'{Bcolors.OKGREEN}Saved as {version_filename}{Bcolors.ENDC}')
+    executor.shutdown()
     if n_updates:
         log.info(f"Updated {n_updates} file{'' if n_updates == 1 else 's'}")
+    # same as difflib.ndiff, with midpoint tie-breaking on Python versions before 3.14
+    differ = (MidpointDiffer if sys.version_info < (3, 14) else difflib.Differ)(charjunk=difflib.IS_CHARACTER_JUNK)
+    fail_color, ok_color, end_color = Bcolors.FAIL, Bcolors.OKGREEN, Bcolors.ENDC  # (local lookups in the diff loop)
     for filename in dcln_filenames:
         save_filename = Path(str(filename) + '~save')
-        if filename.is_file() and save_filename.is_file():
-            n_lines = 0
-            n_diff_lines = 0
-            sentence_block_list1 = read_sentence_block_from_dcln_file(save_filename)
-            sentence_block_list2 = read_sentence_block_from_dcln_file(filename)
-            for sentence_block1, sentence_block2 in zip(sentence_block_list1, sentence_block_list2):
-                n_lines += 1
-                if sentence_block1 != sentence_block2:
-                    n_diff_lines += 1
-                    diff = difflib.ndiff(sentence_block1.splitlines(), sentence_block2.splitlines())
-                    buffer_lines = []
-                    n_lines_in_block = 0
-                    n_lines_to_last_diff = None
-                    for d in diff:
-                        n_lines_in_block += 1
-                        if d.startswith('-') or d.startswith('+'):
-                            # print last 3 of any previous buffer lines (unprinted matching lines)
-                            for buffer_line in buffer_lines[-3:]:
-                                print(buffer_line.rstrip())
-                            buffer_lines = []
-                            if d.startswith('-'):
-                                print(f'{Bcolors.FAIL}{d.rstrip()}{Bcolors.ENDC}')
-                            else:
-                                print(f'{Bcolors.OKGREEN}{d.rstrip()}{Bcolors.ENDC}')
-                            n_lines_to_last_diff = 0
-                        elif d.startswith('?'):
-                            continue
-                        # always print ::line info for differing blocks
-                        elif n_lines_in_block == 1:
-                            print(d.rstrip())
-                        # print up to 3 lines after diff
-                        elif n_lines_to_last_diff is not None:
-                            print(d.rstrip())
-                            n_lines_to_last_diff += 1
-                            if n_lines_to_last_diff >= 3:
-                                n_lines_to_last_diff = None
-                        else:
-                            buffer_lines.append(d.rstrip())
-            log.info(f'{n_diff_lines}/{n_lines} lines differed.')
+        try:
+            identical_p = filecmp.cmp(save_filename, filename, shallow=False)
+        except (FileNotFoundError, IsADirectoryError):  # no ~save file (filename was checked with the args)
+            continue
+        n_lines = 0
+        n_diff_lines = 0
+        if identical_p:
+            # identical files: count the blocks, but don't build them
+            n_lines = count_sentence_blocks_in_dcln_file(filename)
+            block_pairs = ()
+        else:
+            block_pairs = zip(iter_sentence_blocks(save_filename), iter_sentence_blocks(filename))
+        for sentence_block1, sentence_block2 in block_pairs:
+            n_lines += 1
+            if sentence_block1 != sentence_block2:
+                n_diff_lines += 1
+                # Only differing blocks are joined and re-split (splitlines also breaks at e.g. \x85 or \u2028).
+                lines1 = ''.join(sentence_block1).splitlines()
+                lines2 = ''.join(sentence_block2).splitlines()
+                if diff_match_patch and len(lines1) + len(lines2) > large_block_threshold:
+                    diff = large_block_compare(lines1, lines2)
+                else:
+                    diff = differ.compare(lines1, lines2)
+                out = []  # output pieces of this block, written at once
+                buffer_lines = []
+                n_lines_in_block = 0
+                n_lines_to_last_diff = None
+                for d in diff:
+                    n_lines_in_block += 1
+                    d_rstripped = d.rstrip()
+                    if d.startswith('-') or d.startswith('+'):
+                        # print last 3 of any previous buffer lines (unprinted matching lines)
+                        for buffer_line in buffer_lines[-3:]:
+                            out += (buffer_line, '\n')
+                        buffer_lines = []
+                        out += (fail_color if d.startswith('-') else ok_color, d_rstripped, end_color, '\n')
+                        n_lines_to_last_diff = 0
+                    elif d.startswith('?'):
+                        continue
+                    # always print ::line info for differing blocks
+                    elif n_lines_in_block == 1:
+                        out += (d_rstripped, '\n')
+                    # print up to 3 lines after diff
+                    elif n_lines_to_last_diff is not None:
+                        out += (d_rstripped, '\n')
+                        n_lines_to_last_diff += 1
+                        if n_lines_to_last_diff >= 3:
+                            n_lines_to_last_diff = None
+                    else:
+                        buffer_lines.append(d_rstripped)
+                sys.stdout.write(''.join(out))
+        log.info(f'{n_diff_lines}/{n_lines} lines differed.')
     if len(tok_filenames) == 1:
         filename = tok_filenames[0]
     elif len(detok_filenames) == 1:
@@ -190,17 +408,18 @@ if __name__ == "__main__":
     if filename:
         save_filename = Path(str(filename) + '~save')
         if filename.is_file() and save_filename.is_file():
-            command = f'color-mt-diffs.pl {save_filename} {filename}'
-            legend = ' -l old new'
+            # command and legend are assembled as lists of arguments, joined once
+            command_args = ['color-mt-diffs.pl', str(save_filename), str(filename)]
+            legend_args = ['-l', 'old', 'new']
             file_stem = filename.stem
             txt_filename = filename.parent.parent / (file_stem + '.txt')
             if txt_filename.is_file():
-                command += f' {txt_filename}'
-                legend += ' txt'
+                command_args.append(str(txt_filename))
+                legend_args.append('txt')
             eng_filename = None
             eng_legend = 'eng'
-            if re.match(r'.*\.[a-z]{3}$', file_stem):
-                eng_filename_name = re.sub(r'\.[a-z]{3}$', '.eng.txt', file_stem)
+            if re_lang_code_suffix.search(file_stem):
+                eng_filename_name = re_lang_code_suffix.sub('.eng.txt', file_stem)
                 if eng_filename_name != filename.name:
                     eng_filename_cand = filename.parent.parent / eng_filename_name
                     if eng_filename_cand.is_file():
@@ -212,9 +431,8 @@ if __name__ == "__main__":
                     eng_filename = eng_filename_cand
                     eng_legend = 'google'
             if eng_filename:
-                command += f' {eng_filename}'
-                legend += ' ' + eng_legend
-            command += legend
-            command += ' -o /Users/ulf/utoken/test/data/viz/out.html'
+                command_args.append(str(eng_filename))
+                legend_args.append(eng_legend)
+            command = ' '.join(command_args + legend_args + ['-o', '/Users/ulf/utoken/test/data/viz/out.html'])
             # log.info(f'command: {command}')
             subprocess.run(command, shell=True)
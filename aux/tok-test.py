@@ -4,287 +4,510 @@
    Sample call: tok-test.py -i amr-general-corpus.eng.txt
    Sample call: tok-test.py -i set1 -c
    Sample call: tok-test.py -i set2 -c
+   Sample call: tok-test.py -i set2 -c -j 0  # files in parallel
 """
 
 import argparse
+from collections import defaultdict
+import concurrent.futures
+import functools
 import logging as log
 import os
 from pathlib import Path
 import re
 import subprocess
 import sys
+from typing import FrozenSet, List, Optional, Tuple
 
 log.basicConfig(level=log.INFO)
+src_dir = os.path.dirname(os.path.realpath(__file__))
+root_dir = os.path.dirname(src_dir)
+public_test_data_dir = os.path.join(root_dir, 'test', 'data')
+private_test_data_dir = os.path.join(public_test_data_dir, 'private')
+wiki_test_data_dir = os.path.join(public_test_data_dir, 'uroman-large-test-set')
+sacremoses_dir = os.path.join(public_test_data_dir, 'tok-comparison', 'sacremoses')
+old_ulf_tokenizer_dir = os.path.join(public_test_data_dir, 'tok-comparison', 'old-ulf-tokenizer')
+viz_dir = os.path.join(public_test_data_dir, 'viz')
+utoken_out_dirs = {test_dir: os.path.join(test_dir, 'utoken-out')
+                   for test_dir in (public_test_data_dir, private_test_data_dir, wiki_test_data_dir)}
+re_filename_separator = re.compile(r'[;,]\s*')
+re_tok_suffix = re.compile(r'\.tok$')
+# Test sets, i.e. names that -i expands to lists of test files
+test_sets = {
+    'set1': ('amr-general-corpus.eng.txt',
+             'Bible-ULT-woid.eng.txt',  # if args.compare else 'Bible-ULT.eng.txt'
+             'pmindia_v1.eng.txt',
+             'pmindia_v1.hin.txt',
+             '3S-tweetsdev.orig.eng.txt',
+             '3S-tweetsdev.orig.fas.txt',
+             'challenge.eng.txt',
+             'test1.eng.txt',
+             'test.mal.txt'),
+    'set2': ('NewTestament-430randVerses.ecg.txt',
+             'OldTestament-sel.hbo.txt',
+             'Odyssey-Republic-sel.grc.txt',
+             'amh.txt',
+             'ara.txt',
+             'asm.txt',
+             'ben.txt',
+             'bul.txt',
+             'cat.txt',
+             'ces.txt',
+             'cym.txt',
+             'dan.txt',
+             'deu.txt',
+             'ell.txt',
+             'eng.txt',
+             'est.txt',
+             'fin.txt',
+             'fra.txt',
+             'gle.txt',
+             'guj.txt',
+             'heb.txt',
+             'hun.txt',
+             'hye.txt',
+             'ind.txt',
+             'ita.txt',
+             'kan.txt',
+             'kat.txt',
+             'kor.txt',
+             'lao.txt',
+             'lav.txt',
+             'lit.txt',
+             'mal.txt',
+             'mar.txt',
+             'nld.txt',
+             'nor.txt',
+             'ori.txt',
+             'pol.txt',
+             'por.txt',
+             'pus.txt',
+             'que.txt',
+             'ron.txt',
+             'rus.txt',
+             'slk.txt',
+             'slv.txt',
+             'som.txt',
+             'spa.txt',
+             'swa.txt',
+             'swe.txt',
+             'tam.txt',
+             'tel.txt',
+             'tgl.txt',
+             'tur.txt',
+             'urd.txt',
+             'vie.txt',
+             'xho.txt',
+             'yor.txt',
+             'zul.txt'),
+    'set3': ('Bible-IRV-woid.hin.txt',  # if args.compare else 'Bible-IRV.hin.txt'
+             'saral-dev.kaz.txt',
+             'train46735.tgl.txt',
+             'train99005.uig.txt'),
+    'set4': ('ELRC_wikipedia_health.tgl.txt',
+             'OPUS_ParaCrawl_v7_1.tgl.txt'),
+}
+
+
+def start(command: List[str], stdin_filename: Optional[str] = None,
+          stdout_filename: Optional[str] = None) -> Optional[subprocess.Popen]:
+    """Starts a command directly (without a shell), with stdin/stdout redirected from/to any given files.
+    Like a shell, it reports (and skips) a missing input file or program instead of raising an exception."""
+    stdin = stdout = None
+    try:
+        if stdin_filename:
+            stdin = open(stdin_filename, 'rb')
+        if stdout_filename:
+            stdout = open(stdout_filename, 'wb')
+        return subprocess.Popen(command, stdin=stdin, stdout=stdout)
+    except OSError as error:
+        sys.stderr.write(f"{command[0]}: {error}\n")
+        return None
+    finally:
+        for file in (stdin, stdout):
+            if file:
+                file.close()  # (the child process has its own file descriptors)
+
+
+def needs_rebuild(target: str, *sources: str) -> bool:
+    """Make-style check: True if target is missing or older than any of its sources (or a source is missing)."""
+    try:
+        target_mtime = os.path.getmtime(target)
+        return any(os.path.getmtime(source) > target_mtime for source in sources)
+    except OSError:
+        return True
+
+
+def wait(process: Optional[subprocess.Popen]) -> bool:
+    """Waits for a started process (if any); reports a non-zero exit status. Returns True if the process succeeded."""
+    if process is None:
+        return False
+    if return_code := process.wait():
+        sys.stderr.write(f"{process.args[0]} exited with status {return_code}\n")
+    return return_code == 0
+
+
+def run(command: List[str], stdin_filename: Optional[str] = None, stdout_filename: Optional[str] = None) -> bool:
+    return wait(start(command, stdin_filename, stdout_filename))
+
+
+def build(command: List[str], stdin_filename: str, stdout_filename: str) -> None:
+    """Runs a command that builds a file that is kept across runs, removing the (partial) file if the command fails."""
+    if not run(command, stdin_filename, stdout_filename):
+        try:
+            os.remove(stdout_filename)
+        except OSError:
+            pass
+
+
+def run_concurrently(commands: List[Tuple[List[str], Optional[str], Optional[str]]]) -> None:
+    """Starts independent commands (command, stdin_filename, stdout_filename) all at once, then waits for all of them."""
+    processes = [start(*command) for command in commands]
+    for process in processes:
+        wait(process)
+
+
+def file_size(filename: str) -> int:
+    """Returns the size of a file (0 if it doesn't exist), to schedule big files first."""
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+def run_calls(calls: List[Tuple[List[str], str]], executor: Optional[concurrent.futures.Executor] = None) -> None:
+    """Runs commands (command, message), each after writing its message to STDERR;
+    in parallel in the executor, if one is given."""
+    def run_call(call: Tuple[List[str], str]) -> None:
+        command, message = call
+        sys.stderr.write(message)
+        run(command)
+
+    if executor is None:
+        for call in calls:
+            run_call(call)
+    else:
+        for _ in executor.map(run_call, calls):
+            pass
+
+
+def number_of_workers(jobs: int, number_of_tasks: int) -> int:
+    """Pool size for -j JOBS (0: one per CPU), but never more workers than tasks (and at least one)."""
+    return max(1, min(jobs or os.cpu_count() or 1, number_of_tasks))
+
+
+@functools.lru_cache(maxsize=None)
+def files_in_dir(directory: str) -> FrozenSet[str]:
+    """Returns the names of the files in a directory (none if it doesn't exist), scanned only once per directory."""
+    try:
+        with os.scandir(directory) as entries:
+            return frozenset(entry.name for entry in entries if entry.is_file())
+    except (FileNotFoundError, NotADirectoryError):
+        return frozenset()
+
+
+@functools.lru_cache(maxsize=None)
+def utoken_source_files() -> Tuple[str, ...]:
+    """Returns the files of the utoken package (code and data), on which all tokenizations depend."""
+    return tuple(os.path.join(dir_path, filename)
+                 for dir_path, _, filenames in os.walk(os.path.join(root_dir, 'utoken'))
+                 if '__pycache__' not in dir_path
+                 for filename in filenames)
+
+
+def lang_of(core_filename: str) -> Optional[str]:
+    """Returns the 3-letter language code at the end of a core filename (e.g. 'deu' for 'pmindia_v1.deu'), if any."""
+    tail = core_filename.rpartition('.')[2]
+    return tail if len(tail) == 3 and tail.isascii() and tail.isalpha() and tail.islower() else None
+
+
+def locate_test_file(filename: str) -> Optional[Tuple[str, str, Optional[str]]]:
+    """Returns test directory, core filename (without .txt) and language code (if any) of a test file,
+    or None (after a warning) if it can't be found."""
+    if filename.endswith('.txt'):
+        core_filename: str = filename[:-4]
+        if filename in files_in_dir(public_test_data_dir):
+            test_dir = public_test_data_dir
+        elif filename in files_in_dir(private_test_data_dir):
+            test_dir = private_test_data_dir
+        elif filename in files_in_dir(wiki_test_data_dir):
+            test_dir = wiki_test_data_dir
+        else:
+            sys.stderr.write(f"Can't find file {filename}\n")
+            return None
+        return test_dir, core_filename, lang_of(core_filename)
+    else:
+        sys.stderr.write(f"WARNING: Ignoring filename {filename}, because it does not end in '.txt'\n")
+        return None
+
+
+def tokenize_files(test_files: List[Tuple[str, str, str, Optional[str]]], args: argparse.Namespace,
+                   executor: Optional[concurrent.futures.Executor] = None) -> None:
+    """Tokenizes test files (filename, test_dir, core_filename, lang_code) with one utokenize call per
+    language code and -f setting, so that the tokenizer and its resources are loaded once per group, not per file.
+    The calls run in parallel in the executor, if one is given."""
+    if not args.force:  # skip files whose tokenization and annotation are newer than both input and utoken
+        test_files = [test_file for test_file in test_files
+                      if any(needs_rebuild(os.path.join(utoken_out_dirs[test_file[1]], f'{test_file[2]}.{extension}'),
+                                           os.path.join(test_file[1], test_file[0]), *utoken_source_files())
+                             for extension in ('tok', 'json'))]
+    groups = defaultdict(list)  # key: (lang_code, first_token_is_line_id_p)
+    for filename, test_dir, core_filename, lang_code in test_files:
+        first_token_is_line_id_p = (core_filename.startswith('Bible') and '-woid.' not in core_filename) \
+            or filename in ('test.mal.txt', 'test1.eng.txt')
+        groups[(lang_code, first_token_is_line_id_p)].append((filename, test_dir, core_filename))
+    calls = []
+    group_items = groups.items()
+    if executor is not None:  # biggest groups first, so that they don't end up running alone at the end
+        group_items = sorted(group_items, reverse=True,
+                             key=lambda item: sum(file_size(os.path.join(test_dir, filename))
+                                                  for filename, test_dir, _ in item[1]))
+    for (lang_code, first_token_is_line_id_p), group in group_items:
+        utokenize_system_call_args = ['python', '-m', 'utoken.utokenize']
+        if lang_code:
+            utokenize_system_call_args.extend(['--lc', lang_code])
+        if first_token_is_line_id_p:
+            utokenize_system_call_args.append('-f')
+        input_filenames = [os.path.join(test_dir, filename) for filename, test_dir, _ in group]
+        utokenize_system_call_args.extend(['-i', *input_filenames])
+        utokenize_system_call_args.extend(['-o', *(os.path.join(utoken_out_dirs[test_dir], f'{core_filename}.tok')
+                                                  for _, test_dir, core_filename in group)])
+        utokenize_system_call_args.extend(['-a', *(os.path.join(utoken_out_dirs[test_dir], f'{core_filename}.json')
+                                                  for _, test_dir, core_filename in group)])
+        if any(os.path.isfile(input_filename) and os.path.getsize(input_filename) >= 1000000
+               for input_filename in input_filenames):
+            utokenize_system_call_args.append('-pb')
+        if args.verbose:
+            message = f"{' '.join(utokenize_system_call_args)} ...\n"
+        else:
+            message = f"\nutokenize.py {' '.join(filename for filename, _, _ in group)} ...\n"
+        calls.append((utokenize_system_call_args, message))
+    run_calls(calls, executor)
+
+
+def detokenize_files(test_files: List[Tuple[str, str, str, Optional[str]]], args: argparse.Namespace,
+                     executor: Optional[concurrent.futures.Executor] = None) -> None:
+    """Detokenizes the utoken output of test files with one detokenize call per language code (see tokenize_files).
+    Missing tokenizations are skipped here (and reported by run_one)."""
+    groups = defaultdict(list)  # key: lang_code
+    for _, test_dir, core_filename, lang_code in test_files:
+        output_filename = os.path.join(utoken_out_dirs[test_dir], f'{core_filename}.tok')
+        if os.path.isfile(output_filename):
+            groups[lang_code].append(output_filename)
+    group_items = groups.items()
+    if executor is not None:  # biggest groups first
+        group_items = sorted(group_items, reverse=True,
+                             key=lambda item: sum(file_size(output_filename) for output_filename in item[1]))
+    calls = []
+    for lang_code, output_filenames in group_items:
+        detokenize_system_call_args = ['python', '-m', 'utoken.detokenize', '-i', *output_filenames,
+                                       '-o', *(re_tok_suffix.sub('.detok', output_filename)
+                                               for output_filename in output_filenames)]
+        if lang_code:
+            detokenize_system_call_args.extend(['--lc', lang_code])
+        if args.verbose:
+            message = f"{' '.join(detokenize_system_call_args)} ...\n"
+        else:
+            message = f"\ndetok {' '.join(output_filenames)} ...\n"
+        calls.append((detokenize_system_call_args, message))
+    run_calls(calls, executor)
+
+
+def comparison_build_commands(test_files: List[Tuple[str, str, str, Optional[str]]]) \
+        -> List[Tuple[List[str], str, str]]:
+    """Returns commands (command, stdin_filename, stdout_filename) that build the sacremoses and old ulf-tokenizer
+    tokenizations of test files that do not exist yet; existing ones are looked up in listings of their directories.
+    These builds don't depend on utoken's output, so they can run while utokenize does."""
+    build_commands = []
+    for filename, test_dir, core_filename, _ in test_files:
+        input_filename = os.path.join(test_dir, filename)
+        sacremoses_filename = os.path.join(sacremoses_dir, f'{core_filename}.tok')
+        if f'{core_filename}.tok' not in files_in_dir(sacremoses_dir):
+            command = ['sacremoses', '-l', 'en', 'tokenize', '-a', '-x', '-p', ':web:']
+            sys.stderr.write(f"sacremoses {input_filename} ...\n")
+            sys.stderr.write(f"{' '.join(command)} < {input_filename} > {sacremoses_filename} ...\n")
+            build_commands.append((command, input_filename, sacremoses_filename))
+        old_ulf_tokenizer_filename = os.path.join(old_ulf_tokenizer_dir, f'{core_filename}.tok')
+        if f'{core_filename}.tok' not in files_in_dir(old_ulf_tokenizer_dir):
+            command = ['tokenize-english.pl']
+            sys.stderr.write(f"old ulf-tokenizer {input_filename} ...\n")
+            sys.stderr.write(f"{' '.join(command)} < {input_filename} > {old_ulf_tokenizer_filename} ...\n")
+            build_commands.append((command, input_filename, old_ulf_tokenizer_filename))
+    # a file listed more than once is built only once
+    return list({build_command[2]: build_command for build_command in build_commands}.values())
+
+
+def run_one(filename: str, test_dir: str, core_filename: str, lang_code: Optional[str],
+            args: argparse.Namespace, tokenize_p: bool) -> None:
+    """Runs the pipeline after tokenization (see tokenize_files) for a single test file, as selected by args."""
+    input_filename = os.path.join(test_dir, filename)
+    utoken_out_dir = utoken_out_dirs[test_dir]
+    output_filename = os.path.join(utoken_out_dir, f'{core_filename}.tok')
+    ref_files = None
+    ref_legends = None
+    if lang_code and lang_code != 'eng' and '.' in core_filename:
+        english_filename = f'{core_filename[:-3]}eng.txt'
+        if english_filename in files_in_dir(test_dir):
+            ref_files = [input_filename, os.path.join(test_dir, english_filename)]
+            ref_legends = [f'{lang_code}.txt', 'eng.txt']
+    if ref_files is None:
+        google_dir = os.path.join(test_dir, 'google-translations')
+        if f'{core_filename}.eng.txt' in files_in_dir(google_dir):
+            ref_files = [input_filename, os.path.join(google_dir, f'{core_filename}.eng.txt')]
+            ref_legends = [f'{lang_code}.txt', 'google']
+    if not ref_files:
+        ref_files = [input_filename]
+        ref_legends = [f'{lang_code}.txt']
+    color_processes = []  # visualizations, which are built concurrently with each other and with detokenization
+
+    def wait_for_color_processes() -> None:
+        while color_processes:
+            wait(color_processes.pop())
+
+    if tokenize_p:
+        json_annotation_filename = os.path.join(utoken_out_dir, f'{core_filename}.json')
+        dcln_annotation_filename = os.path.join(utoken_out_dir, f'{core_filename}.dcln')
+        if args.reformat or args.compare:
+            sys.stderr.write(f"\n{filename} ...\n")
+
+        # reformat-annotation-json2dcln.py call
+        if args.reformat and (args.force or needs_rebuild(dcln_annotation_filename, json_annotation_filename,
+                                                          os.path.join(src_dir, 'reformat-annotation-json2dcln.py'))):
+            sys.stderr.write(f"reformat ...\n")
+            run(['reformat-annotation-json2dcln.py'], json_annotation_filename, dcln_annotation_filename)
+
+        if args.compare:
+            # (sacremoses and old ulf-tokenizer tokenizations have been built by main, see comparison_build_commands)
+            sacremoses_filename = os.path.join(sacremoses_dir, f'{core_filename}.tok')
+            old_ulf_tokenizer_filename = os.path.join(old_ulf_tokenizer_dir, f'{core_filename}.tok')
+            sys.stderr.write(f"boost ...\n")
+            b1_command = (['boost-tok.py'], output_filename, f'{output_filename}.boost')
+            b2_command = (['boost-tok.py'], old_ulf_tokenizer_filename, f'{old_ulf_tokenizer_filename}.boost')
+            b3_command = (['boost-tok.py'], sacremoses_filename, f'{sacremoses_filename}.boost')
+            boost_commands = [command for command in (b1_command, b2_command, b3_command)
+                              if args.force or needs_rebuild(command[2], command[1],
+                                                             os.path.join(src_dir, 'boost-tok.py'))]
+            if args.orig_compare:
+                # always rebuilt, as boost-detok.py (with -d) writes the same file
+                b4_command = (['boost-tok.py'], input_filename, f'{input_filename}.boost')
+                boost_commands.append(b4_command)
+            run_concurrently(boost_commands)  # (independent of each other)
+            sys.stderr.write(f"color ...\n")
+            sacremoses_viz_filename = os.path.join(viz_dir, f'{core_filename}.sacrem-utoken-diff.html')
+            command = ['color-mt-diffs.pl', sacremoses_filename, output_filename, *ref_files,
+                       '-b', f'{sacremoses_filename}.boost', f'{output_filename}.boost',
+                       '-l', 'sacrem', 'utoken', *ref_legends,
+                       '-o', sacremoses_viz_filename]
+            if args.force or needs_rebuild(sacremoses_viz_filename, sacremoses_filename,
+                                           output_filename, *ref_files,
+                                           f'{sacremoses_filename}.boost', f'{output_filename}.boost'):
+                if args.verbose:
+                    print(' '.join(command))
+                color_processes.append(start(command))
+            old_ulf_tokenizer_viz_filename = os.path.join(viz_dir, f'{core_filename}.old-u-t-utoken-diff.html')
+            command = ['color-mt-diffs.pl', old_ulf_tokenizer_filename, output_filename, *ref_files,
+                       '-b', f'{old_ulf_tokenizer_filename}.boost', f'{output_filename}.boost',
+                       '-l', 'old-u-t', 'utoken', *ref_legends,
+                       '-o', old_ulf_tokenizer_viz_filename]
+            if args.force or needs_rebuild(old_ulf_tokenizer_viz_filename, old_ulf_tokenizer_filename,
+                                           output_filename, *ref_files,
+                                           f'{old_ulf_tokenizer_filename}.boost', f'{output_filename}.boost'):
+                if args.verbose:
+                    print(' '.join(command))
+                color_processes.append(start(command))
+            if args.orig_compare:
+                orig_text_viz_filename = os.path.join(viz_dir, f'{core_filename}.orig-text-utoken-diff.html')
+                ref_files2 = [ref_file for ref_file in ref_files if ref_file != input_filename]
+                ref_legends2 = [ref_legend for ref_legend in ref_legends if ref_legend != f'{lang_code}.txt']
+                command = ['color-mt-diffs.pl', input_filename, output_filename, *ref_files2,
+                           '-b', f'{input_filename}.boost', f'{output_filename}.boost',
+                           '-l', f'{lang_code}.txt', 'utoken', *ref_legends2,
+                           '-o', orig_text_viz_filename,
+                           '-a']
+                if args.verbose:
+                    print(' '.join(command))
+                color_processes.append(start(command))
+    if args.detokenize:
+        if Path(output_filename).is_file():
+            # (detokenized by main, see detokenize_files)
+            detok_filename = re_tok_suffix.sub('.detok', output_filename)
+            if args.compare:
+                detok_viz_filename = os.path.join(viz_dir, f'{core_filename}.orig-text-detok-diff.html')
+                b5_command = (['boost-detok.py'], input_filename, f'{input_filename}.boost')
+                b6_command = (['boost-detok.py'], detok_filename, f'{detok_filename}.boost')
+                # b5 is always rebuilt, as boost-tok.py (with -c -o) writes the same file
+                boost_commands = [b5_command]
+                wait_for_color_processes()  # (the orig-text visualization reads the .boost file that b5 rewrites)
+                if args.force or needs_rebuild(f'{detok_filename}.boost', detok_filename,
+                                               os.path.join(src_dir, 'boost-detok.py')):
+                    boost_commands.append(b6_command)
+                run_concurrently(boost_commands)
+                command = ['color-mt-diffs.pl', input_filename, detok_filename, *ref_files,
+                           '-b', f'{input_filename}.boost', f'{detok_filename}.boost',
+                           '-l', f'{lang_code}.txt', 'detok', *ref_legends,
+                           '-o', detok_viz_filename]
+                if args.verbose:
+                    print(' '.join(command))
+                run(command)
+        else:
+            sys.stderr.write(f"detok warning: {output_filename} missing\n")
+    wait_for_color_processes()
 
 
 if __name__ == "__main__":
-    src_dir = os.path.dirname(os.path.realpath(__file__))
-    root_dir = os.path.dirname(src_dir)
-    public_test_data_dir = os.path.join(root_dir, 'test', 'data')
-    private_test_data_dir = os.path.join(public_test_data_dir, 'private')
-    wiki_test_data_dir = os.path.join(public_test_data_dir, 'uroman-large-test-set')
     parser = argparse.ArgumentParser(description='Runs tokenization test(s)')
-    parser.add_argument('-i', '--input', type=str, help='(comma-separated input filenames)')
+    parser.add_argument('-i', '--input', type=str, required=True, help='(comma-separated input filenames)')
     parser.add_argument('-c', '--compare', action='count', default=0, help='(compare results with other tokenizers)')
     parser.add_argument('-o', '--orig_compare', action='count', default=0, help='(compare original text w/ utoken)')
     parser.add_argument('-d', '--detokenize', action='count', default=0, help='(detokenize results)')
     parser.add_argument('-D', '--detokenize_only', action='count', default=0,
                         help='(detokenize without new tokenization)')
     parser.add_argument('-r', '--reformat', action='count', default=0, help='(reformat json to dcln)')
+    parser.add_argument('-F', '--force', action='count', default=0,
+                        help='(rebuild all outputs, even those newer than their inputs)')
     parser.add_argument('-v', '--verbose', action='count', default=0)
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='(number of files processed in parallel, 0 for one per CPU; default: 1)')
     args = parser.parse_args()
     if args.detokenize_only:
         args.detokenize = True
         tokenize_p = False
     else:
         tokenize_p = True
-    filenames: list[str] = args.input.split(r'[;,]\s*')
-    # filename expansion
-    filenames2 = []
-    for filename in filenames:
-        if filename == 'set1':
-            filenames2.extend(['amr-general-corpus.eng.txt',
-                               'Bible-ULT-woid.eng.txt',  # if args.compare else 'Bible-ULT.eng.txt'
-                               'pmindia_v1.eng.txt',
-                               'pmindia_v1.hin.txt',
-                               '3S-tweetsdev.orig.eng.txt',
-                               '3S-tweetsdev.orig.fas.txt',
-                               'challenge.eng.txt',
-                               'test1.eng.txt',
-                               'test.mal.txt'])
-        elif filename == 'set2':
-            filenames2.extend(['NewTestament-430randVerses.ecg.txt',
-                               'OldTestament-sel.hbo.txt',
-                               'Odyssey-Republic-sel.grc.txt',
-                               'amh.txt',
-                               'ara.txt',
-                               'asm.txt',
-                               'ben.txt',
-                               'bul.txt',
-                               'cat.txt',
-                               'ces.txt',
-                               'cym.txt',
-                               'dan.txt',
-                               'deu.txt',
-                               'ell.txt',
-                               'eng.txt',
-                               'est.txt',
-                               'fin.txt',
-                               'fra.txt',
-                               'gle.txt',
-                               'guj.txt',
-                               'heb.txt',
-                               'hun.txt',
-                               'hye.txt',
-                               'ind.txt',
-                               'ita.txt',
-                               'kan.txt',
-                               'kat.txt',
-                               'kor.txt',
-                               'lao.txt',
-                               'lav.txt',
-                               'lit.txt',
-                               'mal.txt',
-                               'mar.txt',
-                               'nld.txt',
-                               'nor.txt',
-                               'ori.txt',
-                               'pol.txt',
-                               'por.txt',
-                               'pus.txt',
-                               'que.txt',
-                               'ron.txt',
-                               'rus.txt',
-                               'slk.txt',
-                               'slv.txt',
-                               'som.txt',
-                               'spa.txt',
-                               'swa.txt',
-                               'swe.txt',
-                               'tam.txt',
-                               'tel.txt',
-                               'tgl.txt',
-                               'tur.txt',
-                               'urd.txt',
-                               'vie.txt',
-                               'xho.txt',
-                               'yor.txt',
-                               'zul.txt'])
-        elif filename == 'set3':
-            filenames2.extend(['Bible-IRV-woid.hin.txt',  # if args.compare else 'Bible-IRV.hin.txt'
-                               'saral-dev.kaz.txt',
-                               'train46735.tgl.txt',
-                               'train99005.uig.txt'])
-        elif filename == 'set4':
-            filenames2.extend(['ELRC_wikipedia_health.tgl.txt',
-                               'OPUS_ParaCrawl_v7_1.tgl.txt'])
-        else:
-            filenames2.append(filename)
-    filenames = filenames2
-    for filename in filenames:
-        if m := re.match(r'(.*)\.txt$', filename):
-            core_filename: str = m.group(1)
-            if os.path.isfile(os.path.join(public_test_data_dir, filename)):
-                test_dir = public_test_data_dir
-            elif os.path.isfile(os.path.join(private_test_data_dir, filename)):
-                test_dir = private_test_data_dir
-            elif os.path.isfile(os.path.join(wiki_test_data_dir, filename)):
-                test_dir = wiki_test_data_dir
-            else:
-                sys.stderr.write(f"Can't find file {filename}\n")
-                continue
-
-            if m := re.match(r'(?:.*\.)?([a-z]{3})$', core_filename):
-                lang_code = m.group(1)
-            else:
-                lang_code = None
-            input_filename = os.path.join(test_dir, filename)
-            output_filename = os.path.join(test_dir, 'utoken-out', f'{core_filename}.tok')
-            input_path = Path(input_filename)
-            ref_file_s = None
-            ref_legend_s = None
-            if lang_code and lang_code != 'eng' and re.match(r'.*\.[a-z]{3}\.txt$', input_filename):
-                english_filename = re.sub(r'\.[a-z]{3}\.txt$', '.eng.txt', input_filename)
-                if os.path.isfile(english_filename):
-                    ref_file_s = f' {input_filename} {english_filename}'
-                    ref_legend_s = f' {lang_code}.txt eng.txt'
-            if ref_file_s is None:
-                input_filename_path = Path(input_filename)
-                google_dir = input_filename_path.parent / 'google-translations'
-                english_filename = google_dir / f'{input_filename_path.stem}.eng.txt'
-                if english_filename.is_file():
-                    ref_file_s = f' {input_filename} {english_filename}'
-                    ref_legend_s = f' {lang_code}.txt google'
-            if not ref_file_s:
-                ref_file_s = f' {input_filename}'
-                ref_legend_s = f' {lang_code}.txt'
-            # utokenizer call
-            if tokenize_p:
-                utokenize_system_call_args = ['python -m utoken.utokenize']
-                if lang_code:
-                    utokenize_system_call_args.extend(['--lc', lang_code])
-                if (core_filename.startswith('Bible') and '-woid.' not in core_filename)\
-                        or filename in ('test.mal.txt', 'test1.eng.txt'):
-                    utokenize_system_call_args.append('-f')
-                json_annotation_filename = os.path.join(test_dir, 'utoken-out', f'{core_filename}.json')
-                dcln_annotation_filename = os.path.join(test_dir, 'utoken-out', f'{core_filename}.dcln')
-                utokenize_system_call_args.extend(['-i', input_filename])
-                utokenize_system_call_args.extend(['-o', output_filename])
-                utokenize_system_call_args.extend(['-a', json_annotation_filename])
-                if input_path.is_file() and input_path.stat().st_size >= 1000000:
-                    utokenize_system_call_args.append('-pb')
-                utokenize_system_call = ' '.join(utokenize_system_call_args)
-                if args.verbose:
-                    sys.stderr.write(f"{utokenize_system_call} ...\n")
-                else:
-                    sys.stderr.write(f"\nutokenize.py {filename} ...\n")
-                subprocess.run(utokenize_system_call, shell=True)
-
-                # reformat-annotation-json2dcln.py call
-                if args.reformat:
-                    reformat_system_call_args = \
-                        f'reformat-annotation-json2dcln.py < {json_annotation_filename} > {dcln_annotation_filename}'
-                    sys.stderr.write(f"reformat ...\n")
-                    # sys.stderr.write(f'{reformat_system_call_args} ...\n')
-                    subprocess.run(reformat_system_call_args, shell=True)
-
-                if args.compare:
-                    # build sacremoses tokenization, if it does not already exist
-                    sacremoses_filename = os.path.join(public_test_data_dir, 'tok-comparison', 'sacremoses',
-                                                       f'{core_filename}.tok')
-                    if not os.path.isfile(sacremoses_filename):
-                        command = f"cat {input_filename}" \
-                                  f" | sacremoses -l en tokenize -a -x -p ':web:'" \
-                                  f" > {sacremoses_filename}"
-                        sys.stderr.write(f"sacremoses {input_filename} ...\n")
-                        sys.stderr.write(f"{command} ...\n")
-                        subprocess.run(command, shell=True)
-
-                    # build old ulf-tokenizer tokenization, if it does not already exist
-                    old_ulf_tokenizer_filename = os.path.join(public_test_data_dir, 'tok-comparison',
-                                                              'old-ulf-tokenizer', f'{core_filename}.tok')
-                    if not os.path.isfile(old_ulf_tokenizer_filename):
-                        command = f"cat {input_filename}" \
-                                  f" | tokenize-english.pl" \
-                                  f" > {old_ulf_tokenizer_filename}"
-                        sys.stderr.write(f"old ulf-tokenizer {input_filename} ...\n")
-                        sys.stderr.write(f"{command} ...\n")
-                        subprocess.run(command, shell=True)
-
-                    sys.stderr.write(f"boost ...\n")
-                    b1_command = f'boost-tok.py < {output_filename} > {output_filename}.boost'
-                    b2_command = f'boost-tok.py < {old_ulf_tokenizer_filename} > {old_ulf_tokenizer_filename}.boost'
-                    b3_command = f'boost-tok.py < {sacremoses_filename} > {sacremoses_filename}.boost'
-                    subprocess.run(b1_command, shell=True)
-                    subprocess.run(b2_command, shell=True)
-                    subprocess.run(b3_command, shell=True)
-                    if args.orig_compare:
-                        b4_command = f'boost-tok.py < {input_filename} > {input_filename}.boost'
-                        subprocess.run(b4_command, shell=True)
-                    sys.stderr.write(f"color ...\n")
-                    sacremoses_viz_filename = os.path.join(public_test_data_dir, 'viz',
-                                                           f'{core_filename}.sacrem-utoken-diff.html')
-                    command = f'color-mt-diffs.pl {sacremoses_filename} {output_filename}{ref_file_s}' \
-                              f' -b {sacremoses_filename}.boost {output_filename}.boost' \
-                              f' -l sacrem utoken{ref_legend_s}' \
-                              f' -o {sacremoses_viz_filename}'
-                    # sys.stderr.write(f"{command} ...\n")
-                    if args.verbose:
-                        print(command)
-                    subprocess.run(command, shell=True)
-                    old_ulf_tokenizer_viz_filename = os.path.join(public_test_data_dir, 'viz',
-                                                                  f'{core_filename}.old-u-t-utoken-diff.html')
-                    command = f'color-mt-diffs.pl {old_ulf_tokenizer_filename} {output_filename}{ref_file_s}' \
-                              f' -b {old_ulf_tokenizer_filename}.boost {output_filename}.boost' \
-                              f' -l old-u-t utoken{ref_legend_s}' \
-                              f' -o {old_ulf_tokenizer_viz_filename}'
-                    # sys.stderr.write(f"{command} ...\n")
-                    if args.verbose:
-                        print(command)
-                    subprocess.run(command, shell=True)
-                    if args.orig_compare:
-                        orig_text_viz_filename = os.path.join(public_test_data_dir, 'viz',
-                                                              f'{core_filename}.orig-text-utoken-diff.html')
-                        ref_file_s2 = re.sub(f' {input_filename}', '', ref_file_s)
-                        ref_legend_s2 = re.sub(f' {lang_code}.txt', '', ref_legend_s)
-                        command = f'color-mt-diffs.pl {input_filename} {output_filename}{ref_file_s2}' \
-                                  f' -b {input_filename}.boost {output_filename}.boost' \
-                                  f' -l {lang_code}.txt utoken{ref_legend_s2}' \
-                                  f' -o {orig_text_viz_filename}' \
-                                  f' -a'
-                        # sys.stderr.write(f"{command} ...\n")
-                        if args.verbose:
-                            print(command)
-                        subprocess.run(command, shell=True)
-            if args.detokenize:
-                if Path(output_filename).is_file():
-                    if tokenize_p:
-                        sys.stderr.write(f"detok ...\n")
-                    else:
-                        sys.stderr.write(f"\ndetok {output_filename} ...\n")
-                    detok_filename = re.sub(r'\.tok$', '.detok', output_filename)
-                    command = f'python -m utoken.detokenize -i {output_filename} -o {detok_filename}'
-                    if lang_code:
-                        command += f' --lc {lang_code}'
-                    # sys.stderr.write(f"{command} ...\n")
-                    subprocess.run(command, shell=True)
-                    if args.compare:
-                        detok_viz_filename = os.path.join(public_test_data_dir, 'viz',
-                                                          f'{core_filename}.orig-text-detok-diff.html')
-                        b5_command = f'boost-detok.py < {input_filename} > {input_filename}.boost'
-                        subprocess.run(b5_command, shell=True)
-                        b6_command = f'boost-detok.py < {detok_filename} > {detok_filename}.boost'
-                        subprocess.run(b6_command, shell=True)
-                        command = f'color-mt-diffs.pl {input_filename} {detok_filename}{ref_file_s}' \
-                                  f' -b {input_filename}.boost {detok_filename}.boost' \
-                                  f' -l {lang_code}.txt detok{ref_legend_s}' \
-                                  f' -o {detok_viz_filename}'
-                        # sys.stderr.write(f"{command} ...\n")
-                        if args.verbose:
-                            print(command)
-                        subprocess.run(command, shell=True)
-                else:
-                    sys.stderr.write(f"detok warning: {output_filename} missing\n")
-        else:
-            sys.stderr.write(f"WARNING: Ignoring filename {filename}, because it does not end in '.txt'\n")
-            continue
+    filenames: list[str] = [filename for filename in re_filename_separator.split(args.input.strip()) if filename]
+    filenames = [expanded_filename for filename in filenames
+                 for expanded_filename in test_sets.get(filename, (filename,))]
+    test_files = [(filename, *test_file_info) for filename in filenames
+                  if (test_file_info := locate_test_file(filename))]
+    if tokenize_p:  # create any missing output directories once, up front
+        for directory in {utoken_out_dirs[test_dir] for _, test_dir, _, _ in test_files} \
+                | ({sacremoses_dir, old_ulf_tokenizer_dir, viz_dir} if args.compare else set()):
+            os.makedirs(directory, exist_ok=True)
+    # One pool of file workers, for both tokenization and the per-file pipelines, across all test sets (none for -j 1).
+    # The work is done in subprocesses, so threads suffice.
+    file_executor = concurrent.futures.ThreadPoolExecutor(number_of_workers(args.jobs, len(test_files))) \
+        if args.jobs != 1 else None
+    build_commands = comparison_build_commands(test_files) if tokenize_p and args.compare else []
+    # -j counts files, and there are two comparison tokenizers per file
+    with concurrent.futures.ThreadPoolExecutor(number_of_workers(2 * args.jobs, len(build_commands))) as executor:
+        build_futures = [executor.submit(build, *build_command)  # biggest inputs first
+                         for build_command in sorted(build_commands, key=lambda command: file_size(command[1]),
+                                                     reverse=True)]
+        if tokenize_p:
+            tokenize_files(test_files, args, file_executor)
+        if args.detokenize:
+            detokenize_files(test_files, args, file_executor)
+        for future in build_futures:
+            future.result()
+    if file_executor is None:
+        for test_file in test_files:
+            run_one(*test_file, args, tokenize_p)
+    else:
+        with file_executor:  # (the pipelines of different files are independent)
+            # biggest files first (longest processing time first), so that the small ones fill the tail
+            futures = [file_executor.submit(run_one, *test_file, args, tokenize_p)
+                       for test_file in sorted(test_files, reverse=True,
+                                               key=lambda test_file: file_size(os.path.join(test_file[1],
+                                                                                            test_file[0])))]
+            for future in concurrent.futures.as_completed(futures):
+                future.result()  # re-raises any exception from the pipeline
@@ -3,7 +3,11 @@
 
 from utoken import detokenize
 
-detok = detokenize.Detokenizer(lang_code='eng')  # Initialize detokenizer, load resources
-print(detok.detokenize_string("Do n't worry !"))
-print(detok.detokenize_string("Sold , for $ 9,999.99 on ebay.com ."))
+detok = detokenize.Detokenizer(lang_code='eng')  # Initialize detokenizer, load resources (once, then reuse it)
 
+# Detokenize a batch of strings
+for detokenized_s in detok.detokenize_strings(["Do n't worry !",
+                                               "Sold , for $ 9,999.99 on ebay.com ."]):
+    print(detokenized_s)
+# Detokenize a single string
+print(detok.detokenize_string("Capt. O'Connor 's car can n't 've cost $ 100,000 ."))
@@ -3,6 +3,11 @@
 
 from utoken import utokenize
 
-tok = utokenize.Tokenizer(lang_code='eng')  # Initialize tokenizer, load resources
-print(tok.utokenize_string("Dont worry!"))
-print(tok.utokenize_string("Sold,for $9,999.99 on ebay.com."))
+tok = utokenize.Tokenizer(lang_code='eng')  # Initialize tokenizer, load resources (once, then reuse it)
+
+# Tokenize a batch of strings
+for tokenized_s in tok.utokenize_strings(["Dont worry!",
+                                          "Sold,for $9,999.99 on ebay.com."]):
+    print(tokenized_s)
+# Tokenize a single string
+print(tok.utokenize_string("Capt. O'Connor's car can't've cost $100,000."))
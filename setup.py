@@ -32,7 +32,7 @@ setup(
     platforms=['any'],
     author='Ulf Hermjakob',
     author_email='ulf@isi.edu',
-    packages=find_namespace_packages(exclude=['aux']),
+    packages=find_namespace_packages(include=['utoken', 'utoken.*']),
     keywords=['machine translation', 'datasets', 'NLP', 'natural language processing,'
                                                         'computational linguistics'],
     entry_points={
@@ -42,7 +42,7 @@ setup(
         ],
     },
     install_requires=[
-        'regex>=2021.8.3',
+        'regex>=2022.10.31',
         'tqdm>=4.40',
     ],
     include_package_data=True,
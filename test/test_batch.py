@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Checks that batch calls (utokenize_strings, detokenize_strings, several files per CLI call) yield the same output
+as one call per string or file. Usage (in the directory of README.md): python -m unittest discover -s test"""
+
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import unittest
+from utoken import detokenize, utokenize
+
+test_data_dir = Path(__file__).parent / 'data'
+package_dir = Path(__file__).parent.parent
+
+
+def read_test_lines(filename: str, max_n_lines: int = 100) -> list:
+    with open(test_data_dir / filename, encoding='utf-8') as f_in:
+        return [line.rstrip('\n') for line, _ in zip(f_in, range(max_n_lines)) if line.strip()]
+
+
+def run_cli(module: str, *args: str) -> None:
+    subprocess.run([sys.executable, '-m', module, *args], cwd=package_dir, check=True, capture_output=True)
+
+
+class TestBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tok = utokenize.Tokenizer(lang_code='eng')
+        cls.detok = detokenize.Detokenizer(lang_code='eng')
+        line_lists = [read_test_lines('test1.eng.txt'), read_test_lines('amr-general-corpus.eng.txt')]
+        cls.lines = line_lists[0] + line_lists[1]
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.tmp = Path(cls.tmp_dir.name)
+        # Two input files, each with and without line IDs (for option -f)
+        for i, lines in enumerate(line_lists):
+            (cls.tmp / f'in{i}.txt').write_text(''.join(line + '\n' for line in lines), encoding='utf-8')
+            (cls.tmp / f'in{i}.id.txt').write_text(''.join(f'snt{i}.{j}\t{line}\n' for j, line in enumerate(lines)),
+                                                  encoding='utf-8')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def read_tmp(self, filename: str) -> str:
+        return (self.tmp / filename).read_text(encoding='utf-8')
+
+    def test_utokenize_strings(self):
+        self.assertEqual(self.tok.utokenize_strings(self.lines),
+                         [self.tok.utokenize_string(s) for s in self.lines])
+
+    def test_detokenize_strings(self):
+        tokenized_lines = self.tok.utokenize_strings(self.lines)
+        self.assertEqual(self.detok.detokenize_strings(tokenized_lines),
+                         [self.detok.detokenize_string(s) for s in tokenized_lines])
+
+    def check_utokenize_cli(self, suffix: str, *options: str):
+        """Tokenizes both input files in a single call and compares with one call per file."""
+        for annotation_format in ('json', 'double-colon'):
+            prefix = f'tok{suffix}.{annotation_format}'
+            run_cli('utoken.utokenize', '-i', *(str(self.tmp / f'in{i}{suffix}.txt') for i in range(2)),
+                    '-o', *(str(self.tmp / f'{prefix}.batch{i}.txt') for i in range(2)),
+                    '-a', *(str(self.tmp / f'{prefix}.batch{i}.anno') for i in range(2)),
+                    '--annotation_format', annotation_format, *options)
+            for i in range(2):
+                run_cli('utoken.utokenize', '-i', str(self.tmp / f'in{i}{suffix}.txt'),
+                        '-o', str(self.tmp / f'{prefix}.single{i}.txt'),
+                        '-a', str(self.tmp / f'{prefix}.single{i}.anno'),
+                        '--annotation_format', annotation_format, *options)
+                for ext in ('txt', 'anno'):
+                    single_output = self.read_tmp(f'{prefix}.single{i}.{ext}')
+                    self.assertTrue(single_output)
+                    self.assertEqual(self.read_tmp(f'{prefix}.batch{i}.{ext}'), single_output)
+
+    def test_utokenize_cli(self):
+        self.check_utokenize_cli('', '--lc', 'eng')
+
+    def test_utokenize_cli_line_ids(self):
+        self.check_utokenize_cli('.id', '--lc', 'eng', '-f')
+
+    def check_detokenize_cli(self, suffix: str, *options: str):
+        """Detokenizes two (tokenized) input files in a single call and compares with one call per file."""
+        input_filenames = []
+        for i in range(2):
+            input_filenames.append(str(self.tmp / f'detok-in{i}{suffix}.txt'))
+            run_cli('utoken.utokenize', '-i', str(self.tmp / f'in{i}{suffix}.txt'), '-o', input_filenames[-1],
+                    *options)
+        run_cli('utoken.detokenize', '-i', *input_filenames,
+                '-o', *(str(self.tmp / f'detok{suffix}.batch{i}.txt') for i in range(2)), *options)
+        for i in range(2):
+            run_cli('utoken.detokenize', '-i', input_filenames[i],
+                    '-o', str(self.tmp / f'detok{suffix}.single{i}.txt'), *options)
+            single_output = self.read_tmp(f'detok{suffix}.single{i}.txt')
+            self.assertTrue(single_output)
+            self.assertEqual(self.read_tmp(f'detok{suffix}.batch{i}.txt'), single_output)
+
+    def test_detokenize_cli(self):
+        self.check_detokenize_cli('', '--lc', 'eng')
+
+    def test_detokenize_cli_line_ids(self):
+        self.check_detokenize_cli('.id', '--lc', 'eng', '-f')
+
+
+if __name__ == '__main__':
+    unittest.main()
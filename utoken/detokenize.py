@@ -14,7 +14,7 @@ from pathlib import Path
 import re
 import regex
 import sys
-from typing import List, Optional, TextIO, Tuple
+from typing import Iterable, List, Optional, TextIO, Tuple
 from . import __version__, last_mod_date
 from . import util
 
@@ -177,6 +177,11 @@ class Detokenizer:
             # log.info(f'Token-{i}: {token} is markup-punct')
         return result
 
+    def detokenize_strings(self, strings: Iterable[str], lang_code: Optional[str] = None) -> List[str]:
+        """Detokenizes a batch of strings, e.g. a list of tokenized sentences."""
+        detokenize_string = self.detokenize_string
+        return [detokenize_string(s, lang_code) for s in strings]
+
     re_id_snt = re.compile(r'(\S+)(\s+)(\S|\S.*\S)\s*$')
 
     def detokenize_lines(self, input_file: TextIO, output_file: TextIO, lang_code: Optional[str] = None):
@@ -202,9 +207,11 @@ def main():
     # parse arguments
     parser = argparse.ArgumentParser(description='Detokenizes a given text')
     parser.add_argument('-i', '--input', type=argparse.FileType('r', encoding='utf-8', errors='surrogateescape'),
-                        default=sys.stdin, metavar='INPUT-FILENAME', help='(default: STDIN)')
-    parser.add_argument('-o', '--output', type=argparse.FileType('w', encoding='utf-8', errors='ignore'),
-                        default=sys.stdout, metavar='OUTPUT-FILENAME', help='(default: STDOUT)')
+                        nargs='+', default=[sys.stdin], metavar='INPUT-FILENAME',
+                        help='(default: STDIN; several input files are detokenized one after the other, '
+                             'with the detokenizer loaded only once, into as many output files)')
+    parser.add_argument('-o', '--output', type=argparse.FileType('w', encoding='utf-8', errors='ignore'), nargs='+',
+                        default=[sys.stdout], metavar='OUTPUT-FILENAME', help='(default: STDOUT)')
     parser.add_argument('-d', '--data_directory', type=str, default=None, help='(default: standard data directory)')
     parser.add_argument('--lc', type=str, default=None,
                         metavar='LANGUAGE-CODE', help="ISO 639-3, e.g. 'fas' for Persian")
@@ -214,33 +221,37 @@ def main():
     parser.add_argument('--version', action='version',
                         version=f'%(prog)s {__version__} last modified: {last_mod_date}')
     args = parser.parse_args()
+    if len(args.output) != len(args.input):
+        parser.error('number of output files must match number of input files')
     lang_code = args.lc
     data_dir = Path(args.data_directory) if args.data_directory else None
     detok = Detokenizer(lang_code=lang_code, data_dir=data_dir, verbose=bool(args.verbose))
     detok.first_token_is_line_id_p = bool(args.first_token_is_line_id)
 
-    # Open any input or output files. Make sure utf-8 encoding is properly set (in older Python3 versions).
-    if args.input is sys.stdin and not re.search('utf-8', sys.stdin.encoding, re.IGNORECASE):
+    # Make sure utf-8 encoding is properly set (in older Python3 versions).
+    if sys.stdin in args.input and not re.search('utf-8', sys.stdin.encoding, re.IGNORECASE):
         log.error(f"Bad STDIN encoding '{sys.stdin.encoding}' as opposed to 'utf-8'. \
                     Suggestion: 'export PYTHONIOENCODING=UTF-8' or use '--input FILENAME' option")
-    if args.output is sys.stdout and not re.search('utf-8', sys.stdout.encoding, re.IGNORECASE):
+    if sys.stdout in args.output and not re.search('utf-8', sys.stdout.encoding, re.IGNORECASE):
         log.error(f"Error: Bad STDIN/STDOUT encoding '{sys.stdout.encoding}' as opposed to 'utf-8'. \
                     Suggestion: 'export PYTHONIOENCODING=UTF-8' or use use '--output FILENAME' option")
 
     start_time = datetime.datetime.now()
-    if args.verbose:
-        log_info = f'Start: {start_time}  Script: tokenize.py'
-        if args.input is not sys.stdin:
-            log_info += f'  Input: {args.input.name}'
-        if args.output is not sys.stdout:
-            log_info += f'  Output: {args.output.name}'
-        if lang_code:
-            log_info += f'  ISO 639-3 language code: {lang_code}'
-        log.info(log_info)
-    detok.detokenize_lines(input_file=args.input, output_file=args.output, lang_code=lang_code)
+    number_of_lines = 0
+    for input_file, output_file in zip(args.input, args.output):
+        if args.verbose:
+            log_info = f'Start: {start_time}  Script: tokenize.py'
+            if input_file is not sys.stdin:
+                log_info += f'  Input: {input_file.name}'
+            if output_file is not sys.stdout:
+                log_info += f'  Output: {output_file.name}'
+            if lang_code:
+                log_info += f'  ISO 639-3 language code: {lang_code}'
+            log.info(log_info)
+        detok.detokenize_lines(input_file=input_file, output_file=output_file, lang_code=lang_code)
+        number_of_lines += detok.number_of_lines
     end_time = datetime.datetime.now()
     elapsed_time = end_time - start_time
-    number_of_lines = detok.number_of_lines
     lines = 'line' if number_of_lines == 1 else 'lines'
     if args.verbose:
         log.info(f'End: {end_time}  Elapsed time: {elapsed_time}  Processed {str(number_of_lines)} {lines}')
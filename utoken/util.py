@@ -5,17 +5,25 @@ Written by Ulf Hermjakob, USC/ISI
 """
 # -*- encoding: utf-8 -*-
 from collections import defaultdict
+from functools import lru_cache
+import glob
+import hashlib
 import logging as log
+import os
 from pathlib import Path
+import pickle
 import re
 import regex
 import sys
-from typing import Dict, List, Optional, Pattern
+from typing import Collection, DefaultDict, Dict, Iterator, List, Optional, Pattern, Sequence, Tuple
 from . import __version__, last_mod_date
 
 
 class ResourceEntry:
     """Annotated entries for abbreviations, contractions, repairs etc."""
+    __slots__ = ('s', 'lcode', 'lang_codes_not', 'etym_lcode', 'country', 'sem_class', 'case_sensitive', 'tag',
+                 'left_context', 'left_context_not', 'right_context', 'right_context_not')
+
     def __init__(self, s: str, tag: Optional[str] = None,
                  sem_class: Optional[str] = None, country: Optional[str] = None,
                  lcode: Optional[str] = None, lang_codes_not: List[str] = None, etym_lcode: Optional[str] = None,
@@ -37,6 +45,8 @@ class ResourceEntry:
 
 
 class AbbreviationEntry(ResourceEntry):
+    __slots__ = ('expansions',)
+
     def __init__(self, abbrev: str, expansions: Optional[List[str]], sem_class: Optional[str] = None,
                  lcode: Optional[str] = None, country: Optional[str] = None, tag: Optional[str] = None):
         super().__init__(abbrev, sem_class=sem_class, lcode=lcode, country=country, tag=tag)
@@ -45,11 +55,15 @@ class AbbreviationEntry(ResourceEntry):
 
 class LexicalPriorityEntry(ResourceEntry):
     """LexicalPriorityEntry are applied earlier (i.e. with higher priority) than regular LexicalEntry."""
+    __slots__ = ()
+
     def __init__(self, s: str, sem_class: Optional[str] = None, lcode: Optional[str] = None):
         super().__init__(s, sem_class=sem_class, lcode=lcode)
 
 
 class RepairEntry(ResourceEntry):
+    __slots__ = ('target', 'problem')
+
     def __init__(self, bad_s: str, good_s: str, sem_class: Optional[str] = None, problem: Optional[str] = None,
                  lcode: Optional[str] = None, country: Optional[str] = None, tag: Optional[str] = None):
         super().__init__(bad_s, sem_class=sem_class, lcode=lcode, country=country, tag=tag)
@@ -58,6 +72,8 @@ class RepairEntry(ResourceEntry):
 
 
 class ContractionEntry(ResourceEntry):
+    __slots__ = ('target', 'char_splits')
+
     def __init__(self, contraction: str, decontraction: str, sem_class: Optional[str] = None,
                  lcode: Optional[str] = None, country: Optional[str] = None, tag: Optional[str] = None,
                  char_splits: Optional[List[int]] = None):
@@ -67,12 +83,16 @@ class ContractionEntry(ResourceEntry):
 
 
 class LexicalEntry(ResourceEntry):
+    __slots__ = ()
+
     def __init__(self, s: str, sem_class: Optional[str] = None, lcode: Optional[str] = None,
                  country: Optional[str] = None, tag: Optional[str] = None):
         super().__init__(s, sem_class=sem_class, lcode=lcode, country=country, tag=tag)
 
 
 class PunctSplitEntry(ResourceEntry):
+    __slots__ = ('side', 'group')
+
     def __init__(self, s: str, side: str, group: Optional[bool], sem_class: Optional[str] = None,
                  lcode: Optional[str] = None, country: Optional[str] = None, tag: Optional[str] = None):
         super().__init__(s, sem_class=sem_class, lcode=lcode, country=country, tag=tag)
@@ -81,15 +101,112 @@ class PunctSplitEntry(ResourceEntry):
 
 
 class NonSymbolEntry(ResourceEntry):
+    __slots__ = ()
+
     def __init__(self, s: str):
         super().__init__(s)
 
 
+# Patterns applied to every (expanded) line of a resource file
+re_line_through_first_slot_value = re.compile(r"(.*::\S+(?:\s+\S+)?)(.*)$")
+re_comment_tail = re.compile(r"(.*?)\s+#.*")
+re_tok_only_head_slot = re.compile(r'::(repair|punct-split|abbrev|misspelling)\b')
+re_whitespace = re.compile(r'\s+')
+re_lang_code_separator = re.compile(r'[;,\s*]')
+re_comma_separated_integers = re.compile(r'\d+(?:,\s*\d+)*')
+re_head_value_target_value_rest = regex.compile(r'(::\S+\s+)(\S|\S.*?\S)(\s+::target\s+)(\S|\S.*?\S)(\s+::\S.*|\s*)$')
+re_head_value_rest = regex.compile(r'(::\S+\s+)(\S|\S.*?\S)(\s+::\S.*|\s*)$')
+re_head_value_slots = regex.compile(r'(::\S+\s+)(\S|\S.*?\S)(\s+::\S.*)$')
+re_abbrev_or_lexical_value_slots = regex.compile(r'(::(?:abbrev|lexical)\s+)(\S|\S.*?\S)(\s+::\S.*)$')
+re_punct_before_non_space = regex.compile(r'.*[.·] ?\S')
+re_abbrev_first_elem_punct_rest = regex.compile(r'((?:\pL\pM*|\d|[-_])+) ?([.·]) ?((?:\pL|\d).*)$')
+re_lemma_suffix_and_variations = regex.compile(r'((?:\pL\pM*)+)\/(.*)$')
+# Apostrophe -> right/left single quotation mark; hyphen -> en-dash, Armenian hyphen
+apostrophe_variant_tables = [str.maketrans("'", repl_char) for repl_char in "’‘"]
+hyphen_variant_tables = [str.maketrans('-', repl_char) for repl_char in "–֊"]
+
+
+@lru_cache(maxsize=4096)
+def compile_context_regex(regex_string: str) -> Pattern[str]:
+    """Compiled ::left-context, ::right-context etc. of resource entries. Many entries share the same context."""
+    return regex.compile(regex_string, flags=regex.VERSION1)
+
+
+@lru_cache(maxsize=None)
+def trailing_slot_re(slot: str) -> Pattern[str]:
+    """Pattern matching a slot with its value, followed by any further slots, for removal of that slot"""
+    return re.compile(fr'::{slot}\s+(?:\S|\S.*\S)\s*(::\S.*|)$')
+
+
+def default_resource_cache_dir() -> Optional[Path]:
+    """Directory for pickled resource entries (see ResourceDict.load_resource_cached) as specified by environment
+    variable UTOKEN_CACHE_DIR. None (no caching) if that variable is not set."""
+    cache_dir = os.environ.get('UTOKEN_CACHE_DIR')
+    return Path(cache_dir) if cache_dir else None
+
+
+@lru_cache(maxsize=1)
+def utoken_module_signature() -> str:
+    """Python and utoken versions and modification times of all utoken modules, part of resource cache keys"""
+    module_mtimes = ' '.join(f'{module_file.name}:{module_file.stat().st_mtime_ns}'
+                             for module_file in sorted(Path(__file__).parent.glob('*.py')))
+    return f'{sys.version} {__version__} {module_mtimes}'
+
+
+# Slots in tokenization resource files (e.g. data/tok-resource-eng.txt), and required slots per head slot
+tok_resource_valid_slots = frozenset({'abbrev',
+                                       'alt-spelling',
+                                       'case-sensitive',
+                                       'char-split',
+                                       'comment',
+                                       'contraction',
+                                       'country',
+                                       'eng',
+                                       'etym-lcode',
+                                       'example',
+                                       'exp',
+                                       'group',
+                                       'inflections',
+                                       'ipa-trigger-left',
+                                       'last-char-repeatable',
+                                       'lcode',
+                                       'lcode-not',
+                                       'left-context',
+                                       'left-context-not',
+                                       'lexical',
+                                       'misspelling',
+                                       'non-symbol',
+                                       'nonstandard',
+                                       'plural',
+                                       'problem',
+                                       'priority',
+                                       'punct-split',
+                                       'repair',
+                                       'right-context',
+                                       'right-context-not',
+                                       'sem-class',
+                                       'side',
+                                       'substandard',
+                                       'suffix-variations',
+                                       'syntax-checked',
+                                       'tag',
+                                       'target',
+                                       'taxon',
+                                       'token-category'})
+tok_resource_required_slots = {'abbrev': (),
+                               'contraction': ('target',),
+                               'ipa-trigger-left': (),
+                               'lexical': (),
+                               'misspelling': ('target',),
+                               'non-symbol': (),
+                               'punct-split': ('side',),
+                               'repair': ('target',)}
+
 class ResourceDict:
     def __init__(self):
         """Dictionary of ResourceEntries. All dictionary keys are lower case."""
-        self.resource_dict: Dict[str, List[ResourceEntry]] = {}          # primary dict
-        self.reverse_resource_dict: Dict[str, List[ResourceEntry]] = {}  # reverse index
+        self.resource_dict: DefaultDict[str, List[ResourceEntry]] = defaultdict(list)          # primary dict
+        self.reverse_resource_dict: DefaultDict[str, List[ResourceEntry]] = defaultdict(list)  # reverse index
         self.prefix_dict: Dict[str, bool] = {}              # prefixes of headwords to more efficiently stop search
         self.prefix_dict_lexical: Dict[str, bool] = {}
         self.prefix_dict_punct: Dict[str, bool] = {}
@@ -100,22 +217,46 @@ class ResourceDict:
 
     def register_resource_entry_in_reverse_resource_dict(self, resource_entry: ResourceEntry, rev_anchors: List[str]):
         for rev_anchor in rev_anchors:
-            rev_resource_list: List[ResourceEntry] = self.reverse_resource_dict.get(rev_anchor, [])
-            rev_resource_list.append(resource_entry)
-            self.reverse_resource_dict[rev_anchor] = rev_resource_list
+            self.reverse_resource_dict[rev_anchor].append(resource_entry)
+
+    def update(self, other: 'ResourceDict') -> None:
+        """Adds the entries of another ResourceDict, as if its resource files had been loaded into self."""
+        for lc_s, resource_entries in other.resource_dict.items():
+            self.resource_dict[lc_s].extend(resource_entries)
+        for rev_anchor, resource_entries in other.reverse_resource_dict.items():
+            self.reverse_resource_dict[rev_anchor].extend(resource_entries)
+        self.prefix_dict.update(other.prefix_dict)
+        self.prefix_dict_lexical.update(other.prefix_dict_lexical)
+        self.prefix_dict_punct.update(other.prefix_dict_punct)
+        self.max_s_length = max(self.max_s_length, other.max_s_length)
+        for lcode, values in other.pre_name_title_list.items():
+            self.pre_name_title_list[lcode].extend(values)
+        for lcode, values in other.phonetics_list.items():
+            self.phonetics_list[lcode].extend(values)
+        for lcode, values in other.ipa_trigger_left_list.items():
+            self.ipa_trigger_left_list[lcode].extend(values)
 
     @staticmethod
     def line_without_comment(line: str) -> str:
         if '#' in line:
             if line.startswith('#'):
                 return '\n'
-            if (m1 := re.match(r"(.*::\S+(?:\s+\S+)?)(.*)$", line)) and (m2 := re.match(r"(.*?)\s+#.*", m1.group(2))):
+            # A comment can only start after the first ::slot.
+            if (line.rfind('#') > line.find('::')) \
+                    and (m1 := re_line_through_first_slot_value.match(line)) \
+                    and (m2 := re_comment_tail.match(m1.group(2))):
                 return m1.group(1) + m2.group(1)
         return line
 
+    @staticmethod
+    def is_empty_or_comment_line(line: str) -> bool:
+        """Empty line or comment line, possibly starting with a byte order mark"""
+        stripped_line = (line[1:] if line.startswith('\uFEFF') else line).lstrip()
+        return stripped_line == '' or stripped_line.startswith('#')
+
     def abbrev_space_expansions(self, abbrev: str) -> List[str]:
         """'e.g.' -> ['e.g.', 'e. g.']"""
-        if m3 := regex.match(r'((?:\pL\pM*|\d|[-_])+) ?([.·]) ?((?:\pL|\d).*)$', abbrev):
+        if m3 := re_abbrev_first_elem_punct_rest.match(abbrev):
             first_elem = m3.group(1)
             punct = m3.group(2)
             result_list = []
@@ -133,119 +274,128 @@ class ResourceDict:
         lines = [orig_line]
         # expand resource entry with apostophe to alternatives with closely related characters (e.g. single quotes)
         apostrophe = "'"
-        n_lines = len(lines)
-        for line in lines[0:n_lines]:
+        new_lines = []
+        for line in lines:
             if apostrophe in line:
-                repl_chars = "’‘"
                 if "::punct-split" in line:
                     continue
-                elif m5 := regex.match(r'(::\S+\s+)(\S|\S.*?\S)(\s+::target\s+)(\S|\S.*?\S)(\s+::\S.*|\s*)$', line):
+                # Below, only an apostrophe in the head value (or before ::target) leads to new lines.
+                elif apostrophe not in line[:max(line.rfind('::target'), head_slot_value_end(line))]:
+                    continue
+                elif m5 := re_head_value_target_value_rest.match(line):
                     if apostrophe in m5.group(2):
-                        for repl_char in repl_chars:
-                            new_line = f'{m5.group(1)}{regex.sub(apostrophe, repl_char, m5.group(2))}{m5.group(3)}' \
-                                       f'{regex.sub(apostrophe, repl_char, m5.group(4))}{m5.group(5)}'
-                            lines.append(new_line)
-                elif m3 := regex.match(r'(::\S+\s+)(\S|\S.*?\S)(\s+::\S.*|\s*)$', line):
+                        for table in apostrophe_variant_tables:
+                            new_line = f'{m5.group(1)}{m5.group(2).translate(table)}{m5.group(3)}' \
+                                       f'{m5.group(4).translate(table)}{m5.group(5)}'
+                            new_lines.append(new_line)
+                elif m3 := re_head_value_rest.match(line):
                     if apostrophe in m3.group(2):
-                        for repl_char in repl_chars:
-                            new_line = f'{m3.group(1)}{regex.sub(apostrophe, repl_char, m3.group(2))}{m3.group(3)}'
-                            lines.append(new_line)
+                        for table in apostrophe_variant_tables:
+                            new_line = f'{m3.group(1)}{m3.group(2).translate(table)}{m3.group(3)}'
+                            new_lines.append(new_line)
+        lines.extend(new_lines)
         # expand resource entry with hyphen to alternatives with closely related characters (e.g. Armenian hyphen)
         hyphen = "-"
-        n_lines = len(lines)
-        for line in lines[0:n_lines]:
+        new_lines = []
+        for line in lines:
             if hyphen in line:
-                repl_chars = "–֊"  # en-dash, Aramenian hyphen
-                if (repl_chars != '') and (m3 := regex.match(r'(::\S+\s+)(\S|\S.*?\S)(\s+::\S.*|\s*)$', line)):
+                if m3 := re_head_value_rest.match(line):
                     if hyphen in m3.group(2):
-                        for repl_char in repl_chars:
-                            new_line = f'{m3.group(1)}{regex.sub(hyphen, repl_char, m3.group(2))}{m3.group(3)}'
-                            lines.append(new_line)
+                        for table in hyphen_variant_tables:
+                            new_line = f'{m3.group(1)}{m3.group(2).translate(table)}{m3.group(3)}'
+                            new_lines.append(new_line)
+        lines.extend(new_lines)
         # expand resource entry with ::plural
-        n_lines = len(lines)
-        for line in lines[0:n_lines]:
+        new_lines = []
+        for line in lines:
             plural_s = slot_value_in_double_colon_del_list(line, 'plural')
-            plurals = re.split(r';\s*', plural_s) if plural_s else []
+            plurals = [elem.strip() for elem in plural_s.split(';')] if plural_s else []
             for plural in plurals:
-                if m3 := regex.match(r'(::\S+\s+)(\S|\S.*?\S)(\s+::\S.*)$', line):
+                if m3 := re_head_value_slots.match(line):
                     if plural == '+s':
                         plural2 = m3.group(2) + 's'
                     else:
                         plural2 = plural
                     new_line = f'{m3.group(1)}{plural2}{m3.group(3)}'
                     # remove ::plural ...
-                    new_line = re.sub(r'::plural\s+(?:\S|\S.*\S)\s*(::\S.*|)$', r'\1', new_line)
-                    lines.append(new_line)
+                    new_line = trailing_slot_re('plural').sub(r'\1', new_line)
+                    new_lines.append(new_line)
+        lines.extend(new_lines)
         # expand resource entry with ::inflections
-        n_lines = len(lines)
-        for line in lines[0:n_lines]:
+        new_lines = []
+        for line in lines:
             inflection_s = slot_value_in_double_colon_del_list(line, 'inflections')
-            inflections = re.split(r';\s*', inflection_s) if inflection_s else []
+            inflections = [elem.strip() for elem in inflection_s.split(';')] if inflection_s else []
             for inflection in inflections:
-                if m3 := regex.match(r'(::\S+\s+)(\S|\S.*?\S)(\s+::\S.*)$', line):
+                if m3 := re_head_value_slots.match(line):
                     new_line = f'{m3.group(1)}{inflection}{m3.group(3)}'
                     # remove ::inflections ...
-                    new_line = re.sub(r'::inflections\s+(?:\S|\S.*\S)\s*(::\S.*|)$', r'\1', new_line)
-                    lines.append(new_line)
+                    new_line = trailing_slot_re('inflections').sub(r'\1', new_line)
+                    new_lines.append(new_line)
+        lines.extend(new_lines)
         # expand resource entry with ::alt-spelling
-        n_lines = len(lines)
-        for line in lines[0:n_lines]:
+        new_lines = []
+        for line in lines:
             alt_spelling_s = slot_value_in_double_colon_del_list(line, 'alt-spelling')
-            alt_spellings = re.split(r';\s*', alt_spelling_s) if alt_spelling_s else []
+            alt_spellings = [elem.strip() for elem in alt_spelling_s.split(';')] if alt_spelling_s else []
             for alt_spelling in alt_spellings:
-                if m3 := regex.match(r'(::\S+\s+)(\S|\S.*?\S)(\s+::\S.*)$', line):
+                if m3 := re_head_value_slots.match(line):
                     if alt_spelling == '+hyphen':
-                        alt_spelling2 = re.sub(' ', '-', m3.group(2))
+                        alt_spelling2 = m3.group(2).replace(' ', '-')
                     else:
                         alt_spelling2 = alt_spelling
                     new_line = f'{m3.group(1)}{alt_spelling2}{m3.group(3)}'
                     # remove ::alt-spelling ...
-                    new_line = re.sub(r'::alt-spelling\s+(?:\S|\S.*\S)\s*(::\S.*|)$', r'\1', new_line)
-                    lines.append(new_line)
+                    new_line = trailing_slot_re('alt-spelling').sub(r'\1', new_line)
+                    new_lines.append(new_line)
+        lines.extend(new_lines)
         # expand resource entry with extra spaces in punctuation e.g. -> e. g.
-        n_lines = len(lines)
-        for line in lines[0:n_lines]:
-            if m3 := regex.match(r'::(abbrev|lexical)\s+(\S|\S.*?\S)(\s+::\S.*)$', line):
+        new_lines = []
+        for line in lines:
+            if m3 := re_abbrev_or_lexical_value_slots.match(line):
                 abbreviation = m3.group(2)  # Could also be lexical item such as "St. Petersburg"
-                if regex.match(r'.*[.·] ?\S', abbreviation) \
+                if re_punct_before_non_space.match(abbreviation) \
                         and slot_value_in_double_colon_del_list(line, 'sem-class') != 'url'\
                         and (line.startswith('::abbrev ') or line.startswith('::lexical ')):
                     for expanded_abbreviation in self.abbrev_space_expansions(abbreviation):
                         if expanded_abbreviation != abbreviation:
                             new_line = f'::repair {expanded_abbreviation} ::target {abbreviation}{m3.group(3)}'
-                            lines.append(new_line)
+                            new_lines.append(new_line)
                             # log.info(f'Expanding {abbreviation} TO {expanded_abbreviation}')
+        lines.extend(new_lines)
         # expand resource entry with ::last-char-repeatable
-        n_lines = len(lines)
-        for line in lines[0:n_lines]:
+        new_lines = []
+        for line in lines:
             if slot_value_in_double_colon_del_list(line, 'last-char-repeatable'):
-                if m3 := regex.match(r'(::\S+\s+)(\S|\S.*?\S)(\s+::\S.*)$', line):
+                if m3 := re_head_value_slots.match(line):
                     token = m3.group(2)
                     last_char = token[-1]
                     for _ in range(127):
                         token += last_char
                         new_line = f'{m3.group(1)}{token}{m3.group(3)}'
                         # remove any ::last-char-repeatable ...
-                        new_line = re.sub(r'::last-char-repeatable\s+(?:\S|\S.*\S)\s*(::\S.*|)$', r'\1', new_line)
-                        lines.append(new_line)
+                        new_line = trailing_slot_re('last-char-repeatable').sub(r'\1', new_line)
+                        new_lines.append(new_line)
+        lines.extend(new_lines)
         # expand resource entry with ::misspelling
-        n_lines = len(lines)
-        for line in lines[0:n_lines]:
+        new_lines = []
+        for line in lines:
             if line.startswith('::misspelling'):
                 misspelling = slot_value_in_double_colon_del_list(line, 'misspelling')
                 target = slot_value_in_double_colon_del_list(line, 'target')
                 if misspelling and target:
                     rest_line = line.rstrip()
-                    rest_line = re.sub(r'::misspelling\s+(?:\S|\S.*\S)\s*(::\S.*|)$', r'\1', rest_line)
-                    rest_line = re.sub(r'::target\s+(?:\S|\S.*\S)\s*(::\S.*|)$', r'\1', rest_line)
-                    rest_line = re.sub(r'::suffix-variations\s+(?:\S|\S.*\S)\s*(::\S.*|)$', r'\1', rest_line)
+                    rest_line = trailing_slot_re('misspelling').sub(r'\1', rest_line)
+                    rest_line = trailing_slot_re('target').sub(r'\1', rest_line)
+                    rest_line = trailing_slot_re('suffix-variations').sub(r'\1', rest_line)
                     raw_suffix_variation_s = slot_value_in_double_colon_del_list(line, 'suffix-variations')
-                    if raw_suffix_variation_s and (m2 := regex.match(r'((?:\pL\pM*)+)\/(.*)$', raw_suffix_variation_s)):
+                    if raw_suffix_variation_s and (m2 := re_lemma_suffix_and_variations.match(raw_suffix_variation_s)):
                         lemma_suffix = m2.group(1)
-                        suffix_variations = re.split(r';\s*', m2.group(2))
+                        suffix_variations = [elem.strip() for elem in m2.group(2).split(';')]
                     else:
                         lemma_suffix = ''
-                        suffix_variations = re.split(r';\s*', raw_suffix_variation_s) if raw_suffix_variation_s else []
+                        suffix_variations = [elem.strip() for elem in raw_suffix_variation_s.split(';')] \
+                            if raw_suffix_variation_s else []
                     misspellings = [misspelling]
                     targets = [target]
                     misspelling_without_suffix = misspelling[:-len(lemma_suffix)] \
@@ -259,21 +409,95 @@ class ResourceDict:
                         targets.append(target_without_suffix + suffix_variation)
                     for misspelling_variation, target_variation in zip(misspellings, targets):
                         new_line = f'::repair {misspelling_variation} ::target {target_variation} {rest_line}'
-                        lines.append(new_line)
+                        new_lines.append(new_line)
             else:
                 misspelling_s = slot_value_in_double_colon_del_list(line, 'misspelling')
-                misspellings = re.split(r';\s*', misspelling_s) if misspelling_s else []
+                misspellings = [elem.strip() for elem in misspelling_s.split(';')] if misspelling_s else []
                 for misspelling in misspellings:
-                    if m3 := regex.match(r'(::(?:abbrev|lexical)\s+)(\S|\S.*?\S)(\s+::\S.*)$', line):
+                    if m3 := re_abbrev_or_lexical_value_slots.match(line):
                         new_line = f'::repair {misspelling} ::target {m3.group(2)}{m3.group(3)}'
                         # remove ::misspelling ...
-                        new_line = re.sub(r'::misspelling\s+(?:\S|\S.*\S)\s*(::\S.*|)$', r'\1', new_line)
-                        lines.append(new_line)
+                        new_line = trailing_slot_re('misspelling').sub(r'\1', new_line)
+                        new_lines.append(new_line)
+
+        lines.extend(new_lines)
         return lines
 
     re_comma_space = re.compile(r',\s*')
     re_contains_digit = regex.compile(r'.*\d')
 
+    def new_abbreviation_entry(self, s: str, slots: Dict[str, str], line_number: int, filename: Path) \
+            -> AbbreviationEntry:
+        expansion_s = slots.get('exp')
+        expansions = [elem.strip() for elem in expansion_s.split(';')] if expansion_s else []
+        resource_entry = AbbreviationEntry(s, expansions=expansions)
+        self.register_resource_entry_in_reverse_resource_dict(resource_entry, expansions)
+        return resource_entry
+
+    def new_contraction_entry(self, s: str, slots: Dict[str, str], line_number: int, filename: Path) \
+            -> ContractionEntry:
+        target = slots.get('target')
+        char_split_s = slots.get('char-split')
+        char_splits = None
+        if char_split_s:
+            target_tokens = re_whitespace.split(target)
+            if re_comma_separated_integers.match(char_split_s):
+                char_splits = [int(i) for i in self.re_comma_space.split(char_split_s)]
+                if (l1 := len(target_tokens)) != (l2 := len(char_splits)):
+                    log.warning(f"Number of target elements ({l1}) and "
+                                f"number of char-split elements ({l2}) don't match "
+                                f"in line {line_number} in {filename}")
+                    char_splits = None
+                if (l1 := len(s)) != (l2 := sum(char_splits)):
+                    log.warning(f"Length of contraction ({l1}) and "
+                                f"sum of char-split elements ({l2}) don't match "
+                                f"in line {line_number} in {filename}")
+                    char_splits = None
+            else:
+                log.warning(f'Ignoring ill-formed ::char-split {char_split_s} '
+                            f'in line {line_number} in {filename} '
+                            f'(Value should be list of comma-separated integers, e.g. 2,3')
+        resource_entry = ContractionEntry(s, target, char_splits=char_splits)
+        self.register_resource_entry_in_reverse_resource_dict(resource_entry, [target])
+        return resource_entry
+
+    def new_lexical_entry(self, s: str, slots: Dict[str, str], line_number: int, filename: Path) -> LexicalEntry:
+        if slots.get('priority') or (slots.get('sem-class') in ('url',)) or self.re_contains_digit.match(s):
+            return LexicalPriorityEntry(s)
+        else:
+            return LexicalEntry(s)
+
+    def new_punct_split_entry(self, s: str, slots: Dict[str, str], line_number: int, filename: Path) -> PunctSplitEntry:
+        side = slots.get('side')
+        if side not in ('start', 'end', 'both'):
+            log.warning(f'Invalid side {side} in line {line_number} in {filename} '
+                        f'(should be one of start/end/both)')
+        group = slots.get('group', False)
+        return PunctSplitEntry(s, side, group=bool(group))
+
+    def new_repair_entry(self, s: str, slots: Dict[str, str], line_number: int, filename: Path) -> RepairEntry:
+        target = slots.get('target')
+        resource_entry = RepairEntry(s, target)
+        self.register_resource_entry_in_reverse_resource_dict(resource_entry, [target])
+        return resource_entry
+
+    def new_non_symbol_entry(self, s: str, slots: Dict[str, str], line_number: int, filename: Path) \
+            -> NonSymbolEntry:
+        return NonSymbolEntry(s)
+
+    def register_ipa_trigger_left(self, s: str, slots: Dict[str, str], line_number: int, filename: Path) -> None:
+        """::ipa-trigger-left lines are not registered as resource entries, but collected per language."""
+        self.ipa_trigger_left_list[slots.get('lcode')].append(s.lower())
+
+    # Functions building (and, where applicable, reverse-registering) a resource entry for a line's head slot
+    head_slot_entry_builders = {'abbrev': new_abbreviation_entry,
+                                'contraction': new_contraction_entry,
+                                'lexical': new_lexical_entry,
+                                'punct-split': new_punct_split_entry,
+                                'repair': new_repair_entry,
+                                'non-symbol': new_non_symbol_entry,
+                                'ipa-trigger-left': register_ipa_trigger_left}
+
     def load_resource(self, filename: Path, lang_code: Optional[str] = None, verbose: bool = True) -> None:
         """Loads abbreviations, contractions etc. for tokenization.
         Example input file: data/tok-resource-eng.txt"""
@@ -291,181 +515,85 @@ class ResourceDict:
                     lines = self.expand_resource_lines(line_without_comment)
                     n_expanded_lines += len(lines) - 1
                     for line in lines:
-                        if re.match(r'^\uFEFF?\s*(?:#.*)?$', line):  # ignore empty or comment line
+                        if self.is_empty_or_comment_line(line):
                             continue
                         # Check whether cost file line is well-formed. Following call will output specific warnings.
-                        valid = double_colon_del_list_validation(line, str(line_number), str(filename),
-                                                                 valid_slots=['abbrev',
-                                                                              'alt-spelling',
-                                                                              'case-sensitive',
-                                                                              'char-split',
-                                                                              'comment',
-                                                                              'contraction',
-                                                                              'country',
-                                                                              'eng',
-                                                                              'etym-lcode',
-                                                                              'example',
-                                                                              'exp',
-                                                                              'group',
-                                                                              'inflections',
-                                                                              'ipa-trigger-left',
-                                                                              'last-char-repeatable',
-                                                                              'lcode',
-                                                                              'lcode-not',
-                                                                              'left-context',
-                                                                              'left-context-not',
-                                                                              'lexical',
-                                                                              'misspelling',
-                                                                              'non-symbol',
-                                                                              'nonstandard',
-                                                                              'plural',
-                                                                              'problem',
-                                                                              'priority',
-                                                                              'punct-split',
-                                                                              'repair',
-                                                                              'right-context',
-                                                                              'right-context-not',
-                                                                              'sem-class',
-                                                                              'side',
-                                                                              'substandard',
-                                                                              'suffix-variations',
-                                                                              'syntax-checked',
-                                                                              'tag',
-                                                                              'target',
-                                                                              'taxon',
-                                                                              'token-category'],
-                                                                 required_slot_dict={'abbrev': [],
-                                                                                     'contraction': ['target'],
-                                                                                     'ipa-trigger-left': [],
-                                                                                     'lexical': [],
-                                                                                     'misspelling': ['target'],
-                                                                                     'non-symbol': [],
-                                                                                     'punct-split': ['side'],
-                                                                                     'repair': ['target']})
+                        valid, head_slot, slots = parse_and_validate(line, str(line_number), str(filename),
+                                                                     tok_resource_valid_slots,
+                                                                     tok_resource_required_slots)
                         if not valid:
                             n_warnings += 1
                             continue
-                        if m1 := re.match(r"::(\S+)", line):
-                            head_slot = m1.group(1)
-                        else:
+                        if head_slot is None:
                             continue
-                        s = slot_value_in_double_colon_del_list(line, head_slot)
-                        resource_entry = None
-                        if head_slot == 'abbrev':
-                            expansion_s = slot_value_in_double_colon_del_list(line, 'exp')
-                            expansions = re.split(r';\s*', expansion_s) if expansion_s else []
-                            resource_entry = AbbreviationEntry(s, expansions=expansions)
-                            self.register_resource_entry_in_reverse_resource_dict(resource_entry, expansions)
-                        elif head_slot == 'contraction':
-                            target = slot_value_in_double_colon_del_list(line, 'target')
-                            char_split_s = slot_value_in_double_colon_del_list(line, 'char-split')
-                            char_splits = None
-                            if char_split_s:
-                                target_tokens = re.split(r'\s+', target)
-                                if re.match(r'\d+(?:,\s*\d+)*', char_split_s):
-                                    char_splits = [int(i) for i in self.re_comma_space.split(char_split_s)]
-                                    if (l1 := len(target_tokens)) != (l2 := len(char_splits)):
-                                        log.warning(f"Number of target elements ({l1}) and "
-                                                    f"number of char-split elements ({l2}) don't match "
-                                                    f"in line {line_number} in {filename}")
-                                        char_splits = None
-                                    if (l1 := len(s)) != (l2 := sum(char_splits)):
-                                        log.warning(f"Length of contraction ({l1}) and "
-                                                    f"sum of char-split elements ({l2}) don't match "
-                                                    f"in line {line_number} in {filename}")
-                                        char_splits = None
-                                else:
-                                    log.warning(f'Ignoring ill-formed ::char-split {char_split_s} '
-                                                f'in line {line_number} in {filename} '
-                                                f'(Value should be list of comma-separated integers, e.g. 2,3')
-                            resource_entry = ContractionEntry(s, target, char_splits=char_splits)
-                            self.register_resource_entry_in_reverse_resource_dict(resource_entry, [target])
-                        elif head_slot == 'lexical':
-                            sem_class = slot_value_in_double_colon_del_list(line, 'sem-class')
-                            priority = slot_value_in_double_colon_del_list(line, 'priority')
-                            if priority or (sem_class in ('url',)) or self.re_contains_digit.match(s):
-                                resource_entry = LexicalPriorityEntry(s)
-                            else:
-                                resource_entry = LexicalEntry(s)
-                        elif head_slot == 'punct-split':
-                            side = slot_value_in_double_colon_del_list(line, 'side')
-                            if side not in ('start', 'end', 'both'):
-                                log.warning(f'Invalid side {side} in line {line_number} in {filename} '
-                                            f'(should be one of start/end/both)')
-                            group = slot_value_in_double_colon_del_list(line, 'group', False)
-                            resource_entry = PunctSplitEntry(s, side, group=bool(group))
-                        elif head_slot == 'repair':
-                            target = slot_value_in_double_colon_del_list(line, 'target')
-                            resource_entry = RepairEntry(s, target)
-                            self.register_resource_entry_in_reverse_resource_dict(resource_entry, [target])
-                        elif head_slot == 'non-symbol':
-                            resource_entry = NonSymbolEntry(s)
-                        elif head_slot == 'ipa-trigger-left':
-                            lcode = slot_value_in_double_colon_del_list(line, 'lcode')
-                            self.ipa_trigger_left_list[lcode].append(s.lower())
+                        s = slots.get(head_slot)
+                        if entry_builder := self.head_slot_entry_builders.get(head_slot):
+                            resource_entry = entry_builder(self, s, slots, line_number, filename)
+                        else:
+                            resource_entry = None
                         if resource_entry:  # register resource_entry with lowercase key
                             if len(s) > self.max_s_length:
                                 self.max_s_length = len(s)
-                            lc_s = s.lower()
-                            for prefix_length in range(1, len(lc_s)+1):
-                                if head_slot == 'punct-split':
-                                    self.prefix_dict_punct[lc_s[:prefix_length]] = True
-                                elif head_slot == 'lexical' and not isinstance(resource_entry, LexicalPriorityEntry):
-                                    self.prefix_dict_lexical[lc_s[:prefix_length]] = True
-                                else:
-                                    self.prefix_dict[lc_s[:prefix_length]] = True
-                            if sem_class := slot_value_in_double_colon_del_list(line, 'sem-class'):
+                            lc_s = sys.intern(s.lower())
+                            if head_slot == 'punct-split':
+                                prefix_dict = self.prefix_dict_punct
+                            elif head_slot == 'lexical' and not isinstance(resource_entry, LexicalPriorityEntry):
+                                prefix_dict = self.prefix_dict_lexical
+                            else:
+                                prefix_dict = self.prefix_dict
+                            # A prefix dict contains all prefixes of its keys, so once a prefix of lc_s is found,
+                            # all shorter prefixes are already in it as well.
+                            for prefix_length in range(len(lc_s), 0, -1):
+                                prefix = lc_s[:prefix_length]
+                                if prefix in prefix_dict:
+                                    break
+                                prefix_dict[prefix] = True
+                            if sem_class := slots.get('sem-class'):
                                 resource_entry.sem_class = sem_class
                                 if (sem_class == "pre-name-title") \
-                                        and (lcode := slot_value_in_double_colon_del_list(line, 'lcode')):
+                                        and (lcode := slots.get('lcode')):
                                     self.pre_name_title_list[lcode].append(lc_s)
-                            if (token_category := slot_value_in_double_colon_del_list(line, 'token-category')) \
+                            if (token_category := slots.get('token-category')) \
                                     and (token_category == 'phonetics') \
-                                    and (lcode := slot_value_in_double_colon_del_list(line, 'lcode')):
+                                    and (lcode := slots.get('lcode')):
                                 self.phonetics_list[lcode].append(lc_s)
-                            if slot_value_in_double_colon_del_list(line, 'case-sensitive'):
+                            if slots.get('case-sensitive'):
                                 resource_entry.case_sensitive = True
-                            if tag := slot_value_in_double_colon_del_list(line, 'tag'):
+                            if tag := slots.get('tag'):
                                 resource_entry.tag = tag
-                            if left_context_s := slot_value_in_double_colon_del_list(line, 'left-context'):
+                            if left_context_s := slots.get('left-context'):
                                 try:
-                                    resource_entry.left_context = regex.compile(eval('r".*' + left_context_s + '$"'),
-                                                                                flags=regex.VERSION1)
+                                    resource_entry.left_context = compile_context_regex('.*' + left_context_s + '$')
                                     # log.info(f'Left-context({s}) {left_context_s} {resource_entry.left_context}')
                                 except regex.error:
                                     log.warning(f'Regex compile error in l.{line_number} for {s} ::left-context '
                                                 f'{left_context_s}')
-                            if left_context_not_s := slot_value_in_double_colon_del_list(line, 'left-context-not'):
+                            if left_context_not_s := slots.get('left-context-not'):
                                 try:
                                     resource_entry.left_context_not = \
-                                        regex.compile(eval('r".*(?<!' + left_context_not_s + ')$"'),
-                                                      flags=regex.VERSION1)
+                                        compile_context_regex('.*(?<!' + left_context_not_s + ')$')
                                 except regex.error:
                                     log.warning(f'Regex compile error in l.{line_number} for {s} ::left-context-not '
                                                 f'{left_context_not_s}')
-                            if right_context_s := slot_value_in_double_colon_del_list(line, 'right-context'):
+                            if right_context_s := slots.get('right-context'):
                                 try:
-                                    resource_entry.right_context = regex.compile(eval('r"' + right_context_s + '"'),
-                                                                                 flags=regex.VERSION1)
+                                    resource_entry.right_context = compile_context_regex(right_context_s)
                                     # log.info(f'Right-context({s}) {right_context_s} {resource_entry.right_context}')
                                 except regex.error:
                                     log.warning(f'Regex compile error in l.{line_number} for {s} ::right-context '
                                                 f'{right_context_s}')
-                            if right_context_not_s := slot_value_in_double_colon_del_list(line, 'right-context-not'):
+                            if right_context_not_s := slots.get('right-context-not'):
                                 try:
                                     resource_entry.right_context_not = \
-                                        regex.compile(eval('r"(?!' + right_context_not_s + ')"'),
-                                                      flags=regex.VERSION1)
+                                        compile_context_regex('(?!' + right_context_not_s + ')')
                                     # log.info(f'Right-context-not({s}) {right_context_not_s}
                                     # {resource_entry.right_context_not}')
                                 except regex.error:
                                     log.warning(f'Regex compile error in l.{line_number} for {s} ::right-context-not '
                                                 f'{right_context_not_s}')
-                            if lang_code_not_s := slot_value_in_double_colon_del_list(line, 'lcode-not'):
-                                resource_entry.lang_codes_not = re.split(r'[;,\s*]', lang_code_not_s)
-                            abbreviation_entry_list = self.resource_dict.get(lc_s, [])
-                            abbreviation_entry_list.append(resource_entry)
-                            self.resource_dict[lc_s] = abbreviation_entry_list
+                            if lang_code_not_s := slots.get('lcode-not'):
+                                resource_entry.lang_codes_not = re_lang_code_separator.split(lang_code_not_s)
+                            self.resource_dict[lc_s].append(resource_entry)
                             n_entries += 1
                 expanded_clause = f' (plus {n_expanded_lines} expanded lines)' if n_expanded_lines else ''
                 if verbose:
@@ -476,6 +604,61 @@ class ResourceDict:
             else:
                 log.warning(f'Could not open general resource file {filename}')
 
+    def load_resource_cached(self, filename: Path, cache_dir: Optional[Path], lang_code: Optional[str] = None,
+                             verbose: bool = True) -> None:
+        """Same as load_resource, but if cache_dir is not None, keeps the file's resource entries pickled in cache_dir.
+        The cache file name includes a hash of the resource file, lang_code, the Python and utoken versions and the
+        modification times of the utoken modules, so that any change to these leads to a fresh load. When a new
+        cache file is written, older cache files of the same resource file are deleted. As unpickling can execute
+        code, cache_dir should not be writable by others; cache files not owned by the current user or writable by
+        others are ignored. Note that warnings about ill-formed resource lines are only shown when the file is
+        actually loaded, not when it is restored from the cache."""
+        if cache_dir is None:
+            self.load_resource(filename, lang_code=lang_code, verbose=verbose)
+            return
+        try:
+            key_material = filename.read_bytes() + f' {lang_code} {utoken_module_signature()}'.encode()
+        except OSError:
+            self.load_resource(filename, lang_code=lang_code, verbose=verbose)  # reports missing resource file
+            return
+        key = hashlib.blake2b(key_material, digest_size=16).hexdigest()
+        cache_file = cache_dir / f'{filename.name}.{key}.pkl'
+        file_resource_dict = None
+        try:
+            if self.is_trusted_cache_file(cache_file):
+                with open(cache_file, 'rb') as f_cache:
+                    file_resource_dict = pickle.load(f_cache)
+                if verbose:
+                    log.info(f'Loaded entries of {filename} from {cache_file}')
+            else:
+                log.warning(f'Ignoring cache file {cache_file} (not owned by current user or writable by others)')
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            pass  # no (usable) cache file yet
+        if file_resource_dict is None:
+            file_resource_dict = ResourceDict()
+            file_resource_dict.load_resource(filename, lang_code=lang_code, verbose=verbose)
+            try:
+                cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+                tmp_cache_file = cache_file.with_name(f'{cache_file.name}.{os.getpid()}.tmp')
+                with os.fdopen(os.open(tmp_cache_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') \
+                        as f_cache:
+                    pickle.dump(file_resource_dict, f_cache, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_cache_file, cache_file)  # atomic, in case of concurrent tokenizer processes
+                for old_cache_file in cache_dir.glob(f'{glob.escape(filename.name)}.*.pkl'):
+                    if old_cache_file != cache_file:
+                        old_cache_file.unlink(missing_ok=True)  # (possibly deleted by concurrent process)
+            except OSError:
+                pass  # cache is optional, e.g. for read-only cache directories
+        self.update(file_resource_dict)
+
+    @staticmethod
+    def is_trusted_cache_file(cache_file: Path) -> bool:
+        """Cache file is owned by the current user and not writable by group or others (not checked on Windows)"""
+        if not hasattr(os, 'getuid'):
+            return True
+        stat = cache_file.stat()
+        return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
 
 class DetokenizationEntry:
     def __init__(self, s: str, group: Optional[bool] = False,
@@ -531,6 +714,52 @@ class DetokenizationContractionEntry(DetokenizationEntry):
         self.contraction_s = contraction
 
 
+# Slots in detokenization resource files (also applied to tokenization resource files), and required slots
+detok_resource_valid_slots = frozenset({'alt-spelling',
+                                         'attach-tag',
+                                         'auto-attach',
+                                         'char-split',
+                                         'case-sensitive',
+                                         'comment',
+                                         'contraction',
+                                         'country',
+                                         'eng',
+                                         'etym-lcode',
+                                         'example',
+                                         'except',
+                                         'group',
+                                         'ipa-trigger-left',
+                                         'last-char-repeatable',
+                                         'lcode',
+                                         'lcode-not',
+                                         'left-context',
+                                         'left-context-not',
+                                         'lexical',
+                                         'markup-attach',
+                                         'misspelling',
+                                         'non-symbol',
+                                         'nonstandard',
+                                         'paired-delimiter',
+                                         'plural',
+                                         'priority',
+                                         'right-context',
+                                         'right-context-not',
+                                         'sem-class',
+                                         'side',
+                                         'substandard',
+                                         'syntax-checked',
+                                         'tag',
+                                         'target',
+                                         'taxon',
+                                         'token-category'})
+detok_resource_required_slots = {'attach-tag': (),
+                                 'auto-attach': ('side',),
+                                 'contraction': ('target',),
+                                 'ipa-trigger-left': (),
+                                 'lexical': (),
+                                 'markup-attach': (),
+                                 'non-symbol': ()}
+
 class DetokenizationResource:
     def __init__(self):
         self.attach_tag = '@'  # default
@@ -561,74 +790,30 @@ class DetokenizationResource:
                         continue
                     lines = resource_dict.expand_resource_lines(line_without_comment)
                     for line in lines:
-                        if re.match(r'^\uFEFF?\s*(?:#.*)?$', line):  # ignore empty or comment line
+                        if resource_dict.is_empty_or_comment_line(line):
                             continue
-                        if re.match(r'::(repair|punct-split|abbrev|misspelling)\b', line):
+                        if re_tok_only_head_slot.match(line):
                             continue  # In tok-resources, only ::contraction entries are relevant.
                         # Check whether cost file line is well-formed. Following call will output specific warnings.
-                        valid = double_colon_del_list_validation(line, str(line_number), str(filename),
-                                                                 valid_slots=['alt-spelling',
-                                                                              'attach-tag',
-                                                                              'auto-attach',
-                                                                              'char-split',
-                                                                              'case-sensitive',
-                                                                              'comment',
-                                                                              'contraction',
-                                                                              'country',
-                                                                              'eng',
-                                                                              'etym-lcode',
-                                                                              'example',
-                                                                              'except',
-                                                                              'group',
-                                                                              'ipa-trigger-left',
-                                                                              'last-char-repeatable',
-                                                                              'lcode',
-                                                                              'lcode-not',
-                                                                              'left-context',
-                                                                              'left-context-not',
-                                                                              'lexical',
-                                                                              'markup-attach',
-                                                                              'misspelling',
-                                                                              'non-symbol',
-                                                                              'nonstandard',
-                                                                              'paired-delimiter',
-                                                                              'plural',
-                                                                              'priority',
-                                                                              'right-context',
-                                                                              'right-context-not',
-                                                                              'sem-class',
-                                                                              'side',
-                                                                              'substandard',
-                                                                              'syntax-checked',
-                                                                              'tag',
-                                                                              'target',
-                                                                              'taxon',
-                                                                              'token-category'],
-                                                                 required_slot_dict={'attach-tag': [],
-                                                                                     'auto-attach': ['side'],
-                                                                                     'contraction': ['target'],
-                                                                                     'ipa-trigger-left': [],
-                                                                                     'lexical': [],
-                                                                                     'markup-attach': [],
-                                                                                     'non-symbol': []})
+                        valid, head_slot, slots = parse_and_validate(line, str(line_number), str(filename),
+                                                                     detok_resource_valid_slots,
+                                                                     detok_resource_required_slots)
                         if not valid:
                             n_warnings += 1
                             continue
-                        if m1 := re.match(r"::(\S+)", line):
-                            head_slot = m1.group(1)
-                        else:
+                        if head_slot is None:
                             continue
-                        line_lang_code_s = slot_value_in_double_colon_del_list(line, 'lcode')
-                        line_lang_codes = re.split(r'[;,\s*]', line_lang_code_s) if line_lang_code_s else []
+                        line_lang_code_s = slots.get('lcode')
+                        line_lang_codes = re_lang_code_separator.split(line_lang_code_s) if line_lang_code_s else []
                         if doc_lang_codes and line_lang_codes:
                             if not lists_share_element(doc_lang_codes, line_lang_codes):
                                 continue
-                        s = slot_value_in_double_colon_del_list(line, head_slot)
-                        lc_s = s.lower()
+                        s = slots.get(head_slot)
+                        lc_s = sys.intern(s.lower())
                         detokenization_entry = None
                         if head_slot == 'auto-attach':
-                            side = slot_value_in_double_colon_del_list(line, 'side')
-                            group = bool(slot_value_in_double_colon_del_list(line, 'group', False))
+                            side = slots.get('side')
+                            group = bool(slots.get('group', False))
                             detokenization_entry = DetokenizationEntry(s, group, line_lang_codes)
                             if side == 'left' or side == 'both':
                                 for line_lang_code in (line_lang_codes if line_lang_codes else [None]):
@@ -649,26 +834,25 @@ class DetokenizationResource:
                                         self.auto_attach_right_w_lc[key] = True
                                 self.auto_attach_right[lc_s].append(detokenization_entry)
                         elif head_slot == 'markup-attach':
-                            paired_delimiter = bool(slot_value_in_double_colon_del_list(line, 'paired-delimiter',
-                                                                                        False))
-                            group = bool(slot_value_in_double_colon_del_list(line, 'group', False))
+                            paired_delimiter = bool(slots.get('paired-delimiter', False))
+                            group = bool(slots.get('group', False))
                             detokenization_entry = DetokenizationMarkupEntry(s, group=group,
                                                                              paired_delimiter=paired_delimiter)
-                            if except_s := slot_value_in_double_colon_del_list(line, 'except'):
-                                detokenization_entry.exception_list = re.split(r'\s+', except_s)
+                            if except_s := slots.get('except'):
+                                detokenization_entry.exception_list = re_whitespace.split(except_s)
                             self.markup_attach[lc_s].append(detokenization_entry)
                             self.markup_attach_re_elements.add(re.escape(lc_s) + ('+' if group else ''))
                         elif head_slot == 'attach_tag':
                             self.attach_tag = s
                         elif head_slot == 'contraction':
-                            if ((not slot_value_in_double_colon_del_list(line, 'nonstandard'))
-                                    and (not slot_value_in_double_colon_del_list(line, 'substandard'))):
-                                target = slot_value_in_double_colon_del_list(line, 'target')
+                            if ((not slots.get('nonstandard'))
+                                    and (not slots.get('substandard'))):
+                                target = slots.get('target')
                                 lc_target = target.lower()
                                 detokenization_entry = DetokenizationContractionEntry(target, s)
                                 self.contraction_dict[lc_target].append(detokenization_entry)
                         elif head_slot == 'lexical':
-                            tag = slot_value_in_double_colon_del_list(line, 'tag')
+                            tag = slots.get('tag')
                             if tag in ('DECONTRACTION-L', 'DECONTRACTION-R', 'DECONTRACTION-B'):
                                 detokenization_entry = DetokenizationEntry(s)
                                 if tag in ('DECONTRACTION-L', 'DECONTRACTION-B'):  # e.g. s', 'n'
@@ -676,40 +860,36 @@ class DetokenizationResource:
                                 if tag in ('DECONTRACTION-R', 'DECONTRACTION-B'):  # e.g. 's, 'n'
                                     self.auto_attach_left[lc_s].append(detokenization_entry)
                         if detokenization_entry:
-                            detokenization_entry.case_sensitive = \
-                                bool(slot_value_in_double_colon_del_list(line, 'case-sensitive'))
-                            if left_context_s := slot_value_in_double_colon_del_list(line, 'left-context'):
+                            detokenization_entry.case_sensitive = bool(slots.get('case-sensitive'))
+                            if left_context_s := slots.get('left-context'):
                                 try:
                                     detokenization_entry.left_context = \
-                                        regex.compile(eval('r".*' + left_context_s + '$"'), flags=regex.VERSION1)
+                                        compile_context_regex('.*' + left_context_s + '$')
                                 except regex.error:
                                     log.warning(f'Regex compile error in l.{line_number} for {s} ::left-context '
                                                 f'{left_context_s}')
-                            if left_context_not_s := slot_value_in_double_colon_del_list(line, 'left-context-not'):
+                            if left_context_not_s := slots.get('left-context-not'):
                                 try:
                                     detokenization_entry.left_context_not = \
-                                        regex.compile(eval('r".*(?<!' + left_context_not_s + ')$"'),
-                                                      flags=regex.VERSION1)
+                                        compile_context_regex('.*(?<!' + left_context_not_s + ')$')
                                 except regex.error:
                                     log.warning(f'Regex compile error in l.{line_number} for {s} ::left-context-not '
                                                 f'{left_context_not_s}')
-                            if right_context_s := slot_value_in_double_colon_del_list(line, 'right-context'):
+                            if right_context_s := slots.get('right-context'):
                                 try:
-                                    detokenization_entry.right_context = \
-                                        regex.compile(eval('r"' + right_context_s + '"'), flags=regex.VERSION1)
+                                    detokenization_entry.right_context = compile_context_regex(right_context_s)
                                 except regex.error:
                                     log.warning(f'Regex compile error in l.{line_number} for {s} ::right-context '
                                                 f'{right_context_s}')
-                            if right_context_not_s := slot_value_in_double_colon_del_list(line, 'right-context-not'):
+                            if right_context_not_s := slots.get('right-context-not'):
                                 try:
                                     detokenization_entry.right_context_not = \
-                                        regex.compile(eval('r"(?!' + right_context_not_s + ')"'),
-                                                      flags=regex.VERSION1)
+                                        compile_context_regex('(?!' + right_context_not_s + ')')
                                 except regex.error:
                                     log.warning(f'Regex compile error in l.{line_number} for {s} ::right-context-not '
                                                 f'{right_context_not_s}')
-                            if lang_code_not_s := slot_value_in_double_colon_del_list(line, 'lcode-not'):
-                                detokenization_entry.lang_codes_not = re.split(r'[;,\s*]', lang_code_not_s)
+                            if lang_code_not_s := slots.get('lcode-not'):
+                                detokenization_entry.lang_codes_not = re_lang_code_separator.split(lang_code_not_s)
                             n_entries += 1
                 if verbose:
                     log.info(f'Loaded {n_entries} entries from {line_number} lines in {filename}')
@@ -733,24 +913,102 @@ class DetokenizationResource:
 def slot_value_in_double_colon_del_list(line: str, slot: str, default: Optional = None) -> str:
     """For a given slot, e.g. 'cost', get its value from a line such as '::s1 of course ::s2 ::cost 0.3' -> 0.3
     The value can be an empty string, as for ::s2 in the example above."""
-    m = re.match(fr'(?:.*\s)?::{slot}(|\s+\S.*?)(?:\s+::\S.*|\s*)$', line)
-    return m.group(1).strip() if m else default
+    # Find the last ::slot that is preceded and followed by whitespace (or the line boundary).
+    key = '::' + slot
+    end = -1
+    position = line.rfind(key)
+    while position >= 0:
+        end = position + len(key)
+        if (position == 0 or line[position-1].isspace()) and (end == len(line) or line[end].isspace()):
+            break
+        position = line.rfind(key, 0, end - 1)
+    if position < 0:
+        return default
+    return line[end:slot_value_end(line, end)].strip()
 
 
-def double_colon_del_list_validation(s: str, line_id: str, filename: str,
-                                     valid_slots: List[str], required_slot_dict: Dict[str, List[str]]) -> bool:
-    """Check whether a string (typically line in data file) is a well-formed double-colon expression"""
-    valid = True
-    prev_slots = []
-    if slots := re.findall(r'::([a-z]\S*)', s, re.IGNORECASE):
-        head_slot = slots[0]
-        if (required_slots := required_slot_dict.get(head_slot, None)) is None:
-            valid = False
-            log.warning(f'found invalid head-slot ::{head_slot} in line {line_id} in {filename}')
-            required_slots = []
+def head_slot_value_end(line: str) -> int:
+    """End position of the value of the first slot in a line, e.g. of 'a b' in '::lexical a b ::tag x'"""
+    elements = line.split(maxsplit=2)
+    if len(elements) < 2:
+        return 0
+    return slot_value_end(line, line.find(elements[1], len(elements[0])) + 1)
+
+
+def slot_value_end(line: str, start: int) -> int:
+    """A slot value starting at position start (> 0) extends to the next ::slot that follows whitespace,
+    or else to the end of the line."""
+    return next(slot_start_positions(line, start), len(line))
+
+
+re_slot_marker = re.compile(r'::([a-z]\S*)', re.IGNORECASE)
+re_slot_missing_space = re.compile(r'.*?(\S+::[a-z]\S*)')
+re_slot_missing_colon = re.compile(r'(?:.*\s)?(:[a-z]\S*)')
+re_emoji_shortcut = re.compile(r':[a-z][-_a-z]*[a-z]:$', flags=re.IGNORECASE)
+re_symbol_or_emoji = re.compile(r'.*\b(?:symbol|emoji)\b', flags=re.IGNORECASE)
+re_syntax_checked = re.compile(r'.*::syntax-checked True\b')
+
+
+def double_colon_slots_and_values(line: str) -> List[List[str]]:
+    """Get all slots (including duplicates) and their values from a line in a single pass,
+    e.g. '::s1 of course ::s2 ::cost 0.3' -> [['s1', 'of course'], ['s2', ''], ['cost', '0.3']]"""
+    slot_starts = list(slot_start_positions(line))
+    slots_and_values = []
+    for slot_start, slot_end in zip(slot_starts, slot_starts[1:] + [len(line)]):
+        slot_and_value = line[slot_start+2:slot_end].split(maxsplit=1)
+        slots_and_values.append([slot_and_value[0], slot_and_value[1].strip() if len(slot_and_value) == 2 else ''])
+    return slots_and_values
+
+
+def parse_double_colon_line(line: str) -> Dict[str, str]:
+    """Get all slots and their values from a line in a single pass, e.g. '::s1 of course ::s2 ::cost 0.3'
+    -> {'s1': 'of course', 's2': '', 'cost': '0.3'}. Values are the same as by slot_value_in_double_colon_del_list."""
+    return {sys.intern(slot): value for slot, value in double_colon_slots_and_values(line)}
+
+
+def parse_and_validate(line: str, line_id: str, filename: str,
+                       valid_slots: Collection[str],
+                       required_slot_dict: Dict[str, Sequence[str]]) -> Tuple[bool, Optional[str], Dict[str, str]]:
+    """Validates a line (with the same warnings as double_colon_del_list_validation) and parses it
+    (as parse_double_colon_line) in a single pass. Returns (valid, head_slot, slot_dict), where head_slot is None
+    unless the line starts with a slot. If every colon in the line belongs to a slot that starts with an ASCII letter,
+    the slots found by the parser are the same as those found by the validator, so the validator's slot checks can
+    use them directly and its ::slot syntax checks are not needed. Otherwise, fall back to the full validation."""
+    slots_and_values = double_colon_slots_and_values(line)
+    slots = [slot for slot, _ in slots_and_values]
+    if slots and line.count(':') == 2 * len(slots) and all(slot[0].isascii() and slot[0].isalpha() for slot in slots):
+        valid = double_colon_slot_validation(slots, line_id, filename, valid_slots, required_slot_dict)
     else:
-        log.warning(f'found no slots in line {line_id} in {filename}')
-        return False
+        valid = double_colon_del_list_validation(line, line_id, filename, valid_slots, required_slot_dict)
+    if not valid:
+        return False, None, {}
+    head_slot = sys.intern(slots[0]) if slots and line.startswith('::') and not line[2:3].isspace() else None
+    return True, head_slot, {sys.intern(slot): value for slot, value in slots_and_values}
+
+
+def slot_start_positions(line: str, start: int = 0) -> Iterator[int]:
+    """Positions (from start) of '::' that start a slot, i.e. that follow whitespace (or the line start)
+    and precede a non-space"""
+    position = line.find('::', start)
+    while position >= 0:
+        if (position == 0 or line[position-1].isspace()) and position + 2 < len(line) \
+                and not line[position+2].isspace():
+            yield position
+        position = line.find('::', position + 1)
+
+
+def double_colon_slot_validation(slots: List[str], line_id: str, filename: str,
+                                 valid_slots: Collection[str],
+                                 required_slot_dict: Dict[str, Sequence[str]]) -> bool:
+    """Check the (non-empty) list of slots of a double-colon expression for an invalid head slot, duplicate or
+    unexpected slots, and missing required slots"""
+    valid = True
+    prev_slots = set()
+    head_slot = slots[0]
+    if (required_slots := required_slot_dict.get(head_slot, None)) is None:
+        valid = False
+        log.warning(f'found invalid head-slot ::{head_slot} in line {line_id} in {filename}')
+        required_slots = []
     # Check for duplicates and unexpected slots
     for slot in slots:
         if slot in valid_slots:
@@ -758,7 +1016,7 @@ def double_colon_del_list_validation(s: str, line_id: str, filename: str,
                 valid = False
                 log.warning(f'found duplicate slot ::{slot} in line {line_id} in {filename}')
             else:
-                prev_slots.append(slot)
+                prev_slots.add(slot)
         else:
             valid = False
             log.warning(f'found unexpected slot ::{slot} in line {line_id} in {filename}')
@@ -768,28 +1026,51 @@ def double_colon_del_list_validation(s: str, line_id: str, filename: str,
             if slot not in prev_slots:
                 valid = False
                 log.warning(f'missing required slot ::{slot} in line {line_id} in {filename}')
-    # Check for ::slot syntax problems
-    if m := re.match(r'.*?(\S+::[a-z]\S*)', s):
-        valid = False
-        value = m.group(1)
-        if re.match(r'.*:::', value):
-            log.warning(f"suspected spurious colon in '{value}' in line {line_id} in {filename}")
-        else:
-            log.warning(f"# Warning: suspected missing space in '{value}' in line {line_id} in {filename}")
-    # Element starts with single colon (:). Might be slot with a missing colon.
-    if m := re.match(r'(?:.*\s)?(:[a-z]\S*)', s):
-        # Exception :emoji-shortcut:
-        if re.match(r':[a-z][-_a-z]*[a-z]:$', m.group(1), flags=re.IGNORECASE) \
-                and re.match(r'.*\b(?:symbol|emoji)\b', s, flags=re.IGNORECASE):
-            pass
-        elif re.match(r'.*::syntax-checked True\b', s):
-            pass
-        else:
+    return valid
+
+
+def double_colon_del_list_validation(s: str, line_id: str, filename: str,
+                                     valid_slots: Collection[str],
+                                     required_slot_dict: Dict[str, Sequence[str]]) -> bool:
+    """Check whether a string (typically line in data file) is a well-formed double-colon expression"""
+    slot_matches = list(re_slot_marker.finditer(s))
+    if not (slots := [m.group(1) for m in slot_matches]):
+        log.warning(f'found no slots in line {line_id} in {filename}')
+        return False
+    valid = double_colon_slot_validation(slots, line_id, filename, valid_slots, required_slot_dict)
+    # Check for ::slot syntax problems, unless every colon in s is part of a ::slot that follows a space (or line start)
+    if (s.count(':') != 2 * len(slots)) \
+            or any(m.start() and not s[m.start()-1].isspace() for m in slot_matches):
+        if m := re_slot_missing_space.match(s):
             valid = False
-            log.warning(f"suspected missing colon in '{m.group(1)}' in line {line_id} in {filename}")
+            value = m.group(1)
+            if ':::' in value:
+                log.warning(f"suspected spurious colon in '{value}' in line {line_id} in {filename}")
+            else:
+                log.warning(f"# Warning: suspected missing space in '{value}' in line {line_id} in {filename}")
+        # Element starts with single colon (:). Might be slot with a missing colon.
+        if m := re_slot_missing_colon.match(s):
+            # Exception :emoji-shortcut:
+            if re_emoji_shortcut.match(m.group(1)) \
+                    and re_symbol_or_emoji.match(s):
+                pass
+            elif re_syntax_checked.match(s):
+                pass
+            else:
+                valid = False
+                log.warning(f"suspected missing colon in '{m.group(1)}' in line {line_id} in {filename}")
     return valid
 
 
+# Slots in data/top-level-domain-codes.txt
+top_level_domain_valid_slots = frozenset({'code',
+                                           'comment',
+                                           'country-name',
+                                           'example',
+                                           'reliability'})
+top_level_domain_required_slots = {'code': ()}
+
+
 def load_top_level_domains(filename: Path) -> (List[str], List[str], List[str]):
     """Loads top level domain resource for URLs etc.
     Example input file: data/top-level-domain-codes.txt"""
@@ -806,22 +1087,17 @@ def load_top_level_domains(filename: Path) -> (List[str], List[str], List[str]):
                 line = ResourceDict.line_without_comment(orig_line)
                 if line.strip() == '':
                     continue
-                if re.match(r'^\uFEFF?\s*(?:#.*)?$', line):  # ignore empty or comment line
+                if ResourceDict.is_empty_or_comment_line(line):
                     continue
                 # Check whether cost file line is well-formed. Following call will output specific warnings.
-                valid = double_colon_del_list_validation(line, str(line_number), str(filename),
-                                                         valid_slots=['code',
-                                                                      'comment',
-                                                                      'country-name',
-                                                                      'example',
-                                                                      'reliability'],
-                                                         required_slot_dict={'code': []})
+                valid, _, slots = parse_and_validate(line, str(line_number), str(filename),
+                                                     top_level_domain_valid_slots, top_level_domain_required_slots)
                 if not valid:
                     n_warnings += 1
                     continue
-                if code := slot_value_in_double_colon_del_list(line, 'code'):
+                if code := slots.get('code'):
                     # country_code = slot_value_in_double_colon_del_list(line, 'country-code')
-                    reliability = slot_value_in_double_colon_del_list(line, 'reliability')
+                    reliability = slots.get('reliability')
                     if reliability == 'low':
                         top_level_domain_names_with_low_reliability.append(code.lower())
                     elif reliability == 'high':
@@ -887,7 +1163,7 @@ def reg_plural(s: str, n: int) -> str:
     """Form regular English plural form, e.g. 'position' -> 'positions' 'bush' -> 'bushes'"""
     if n == 1:
         return s
-    elif re.match('(?:[sx]|[sc]h)$', s):
+    elif s.endswith(('s', 'x', 'sh', 'ch')):
         return s + 'es'
     else:
         return s + 's'
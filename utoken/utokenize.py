@@ -10,6 +10,7 @@ When using STDIN and/or STDOUT, if might be necessary, particularly for older ve
 """
 # -*- encoding: utf-8 -*-
 import argparse
+import contextlib
 import time
 from itertools import chain
 import cProfile
@@ -23,7 +24,7 @@ import pstats
 import re
 import regex
 import sys
-from typing import Callable, IO, List, Match, Optional, TextIO, Tuple, Type
+from typing import Callable, IO, Iterable, List, Match, Optional, TextIO, Tuple, Type
 from tqdm.auto import tqdm
 import unicodedata as ud
 from . import __version__, last_mod_date
@@ -176,8 +177,10 @@ class Chart:
 
 class Tokenizer:
     def __init__(self, lang_code: Optional[str] = None, data_dir: Optional[Path] = None,
-                 verbose: Optional[bool] = False):
+                 verbose: Optional[bool] = False, resource_cache_dir: Optional[Path] = None):
         # argument lang_code is actually a comma (or semicolon)-separated list of language codes, e.g. "spa, cat"
+        # argument resource_cache_dir: optional directory for pickled resource entries for faster loading
+        #     (default: environment variable UTOKEN_CACHE_DIR; no caching if neither is specified)
         # Ordered list of tokenization steps
         self.tok_step_functions = [self.normalize_characters,
                                    self.tokenize_xmls,
@@ -367,17 +370,19 @@ class Tokenizer:
         self.annotation_json_elements: list[str] = []
         if data_dir is None:
             data_dir = self.default_data_dir()
+        if resource_cache_dir is None:
+            resource_cache_dir = util.default_resource_cache_dir()
         # Load tokenization resource entries for language specified by 'lang_codes'
         for lcode in self.lang_codes:
-            self.tok_dict.load_resource(data_dir / f'tok-resource-{lcode}.txt', lang_code=lcode,
-                                        verbose=self.verbose)
+            self.tok_dict.load_resource_cached(data_dir / f'tok-resource-{lcode}.txt', resource_cache_dir,
+                                               lang_code=lcode, verbose=self.verbose)
         # Load any other tokenization resource entries, for the time being just (global) English
         for lcode in ['eng-global']:
             if lcode not in self.lang_codes:
-                self.tok_dict.load_resource(data_dir / f'tok-resource-{lcode}.txt', lang_code=lcode,
-                                            verbose=self.verbose)
+                self.tok_dict.load_resource_cached(data_dir / f'tok-resource-{lcode}.txt', resource_cache_dir,
+                                                   lang_code=lcode, verbose=self.verbose)
         # Load language-independent tokenization resource entries
-        self.tok_dict.load_resource(data_dir / 'tok-resource.txt', verbose=self.verbose)
+        self.tok_dict.load_resource_cached(data_dir / 'tok-resource.txt', resource_cache_dir, verbose=self.verbose)
         # Load detokenization resource entries, for proper mt-tokenization, e.g. @...@
         self.detok_resource.load_resource(data_dir / f'detok-resource.txt', self.lang_codes, verbose=self.verbose)
         self.detok_resource.build_markup_attach_re(self)
@@ -2063,6 +2068,11 @@ class Tokenizer:
                     chart.print_to_file(annotation_file)
         return s.strip()
 
+    def utokenize_strings(self, strings: Iterable[str], lang_code: Optional[str] = None) -> List[str]:
+        """Tokenizes a batch of strings (without annotation), e.g. a list of sentences."""
+        utokenize_string = self.utokenize_string
+        return [utokenize_string(s, lang_code=lang_code) for s in strings]
+
     re_id_snt = re.compile(r'(\S+)(\s+)(\S|\S.*\S)\s*$')
 
     def utokenize_lines(self, ht: dict, input_file: IO, output_file: TextIO, annotation_file: Optional[TextIO],
@@ -2072,6 +2082,11 @@ class Tokenizer:
         line_number = 0
         st = time.time()
         prefix = 'Tokenizing'
+        # JSON annotation elements are written out line by line, so they don't accumulate for the whole file.
+        json_annotation_p = annotation_file and annotation_format == 'json'
+        json_separator = ''
+        if json_annotation_p:
+            annotation_file.write('[')
         with tqdm(input_file, total=total_bytes, disable=not progress_bar, unit='b', unit_scale=True,
                   dynamic_ncols=True, desc=prefix) as data_bar:
             for line in data_bar:
@@ -2094,8 +2109,12 @@ class Tokenizer:
                     output_file.write(self.utokenize_string(line.rstrip("\n"), line_id, lang_code, ht,
                                                             annotation_file, annotation_format)
                                       + "\n")
-            if annotation_file and annotation_format == 'json':
-                annotation_file.write('[' + ',\n'.join(self.annotation_json_elements) + ']\n')
+                if json_annotation_p and self.annotation_json_elements:
+                    annotation_file.write(json_separator + ',\n'.join(self.annotation_json_elements))
+                    json_separator = ',\n'
+                    self.annotation_json_elements.clear()
+            if json_annotation_p:
+                annotation_file.write(']\n')
             data_bar.close()
 
 
@@ -2103,12 +2122,14 @@ def main():
     """Wrapper around tokenization that takes care of argument parsing and prints change stats to STDERR."""
     # parse arguments
     parser = argparse.ArgumentParser(description='Tokenizes a given text')
-    parser.add_argument('-i', '--input', type=Path,
-                        default=sys.stdin, metavar='INPUT-FILENAME', help='(default: STDIN)')
-    parser.add_argument('-o', '--output', type=argparse.FileType('w', encoding='utf-8', errors='ignore'),
-                        default=sys.stdout, metavar='OUTPUT-FILENAME', help='(default: STDOUT)')
+    parser.add_argument('-i', '--input', type=Path, nargs='+',
+                        default=[sys.stdin], metavar='INPUT-FILENAME',
+                        help='(default: STDIN; several input files are tokenized one after the other, '
+                             'with the tokenizer loaded only once, into as many output and annotation files)')
+    parser.add_argument('-o', '--output', type=argparse.FileType('w', encoding='utf-8', errors='ignore'), nargs='+',
+                        default=[sys.stdout], metavar='OUTPUT-FILENAME', help='(default: STDOUT)')
     parser.add_argument('-a', '--annotation_file', type=argparse.FileType('w', encoding='utf-8', errors='ignore'),
-                        default=None, metavar='ANNOTATION-FILENAME', help='(optional output)')
+                        nargs='+', default=None, metavar='ANNOTATION-FILENAME', help='(optional output)')
     parser.add_argument('--annotation_format', type=str, default='json',
                         help="(default: 'json'; alternative: 'double-colon')")
     parser.add_argument('-p', '--profile', type=argparse.FileType('w', encoding='utf-8', errors='ignore'),
@@ -2129,6 +2150,8 @@ def main():
     parser.add_argument('--version', action='version',
                         version=f'%(prog)s {__version__} last modified: {last_mod_date}')
     args = parser.parse_args()
+    if len(args.output) != len(args.input) or (args.annotation_file and len(args.annotation_file) != len(args.input)):
+        parser.error('number of output (and any annotation) files must match number of input files')
     lang_code = args.lc
     data_dir = Path(args.data_directory) if args.data_directory else None
     tok = Tokenizer(lang_code=lang_code, data_dir=data_dir, verbose=bool(args.verbose))
@@ -2141,44 +2164,53 @@ def main():
         if tok.profile_scope is None:
             tok.profile.enable()
             tok.profile_active = True
-    if args.input is sys.stdin:
-        args.total_bytes = None
-        if not re.search('utf-8', sys.stdin.encoding, re.IGNORECASE):
-            log.error(f"Bad STDIN encoding '{sys.stdin.encoding}' as opposed to 'utf-8'. \
-                        Suggestion: 'export PYTHONIOENCODING=UTF-8' or use '--input FILENAME' option")
-    else:
-        inp_path = args.input
-        assert isinstance(inp_path, Path)
-        if not inp_path.exists():
-            raise ValueError(f"{inp_path} does not exist.")
-        args.total_bytes = inp_path.stat().st_size
-        args.input = argparse.FileType('r', encoding='utf-8', errors='surrogateescape')(str(inp_path))
-
-    # Make sure utf-8 encoding is properly set (in older Python3 versions).
-    if args.output is sys.stdout and not re.search('utf-8', sys.stdout.encoding, re.IGNORECASE):
-        log.error(f"Error: Bad STDIN/STDOUT encoding '{sys.stdout.encoding}' as opposed to 'utf-8'. \
-                    Suggestion: 'export PYTHONIOENCODING=UTF-8' or use use '--output FILENAME' option")
-
     ht = {}
     start_time = datetime.datetime.now()
-    if args.verbose:
-        log_info = f'Start: {start_time}  Script: tokenize.py'
-        if args.input is not sys.stdin:
-            log_info += f'  Input: {args.input.name}'
-        if args.output is not sys.stdout:
-            log_info += f'  Output: {args.output.name}'
-        if args.annotation_file:
-            log_info += f'  Annotation: {args.annotation_file.name}'
-        if tok.chart_p:
-            log_info += f'  Chart to be built: {tok.chart_p}'
-        if tok.simple_tok_p:
-            log_info += f'  Simple tokenization (no @-@ etc.): {tok.simple_tok_p}'
-        if lang_code:
-            log_info += f'  ISO 639-3 language code: {lang_code}'
-        log.info(log_info)
-    tok.utokenize_lines(ht, input_file=args.input, output_file=args.output, annotation_file=args.annotation_file,
-                        annotation_format=args.annotation_format, lang_code=lang_code, total_bytes=args.total_bytes,
-                        progress_bar=args.progress_bar)
+    number_of_lines = 0
+    for input_file, output_file, annotation_file in zip(args.input, args.output,
+                                                        args.annotation_file or [None] * len(args.input)):
+        if input_file is sys.stdin:
+            total_bytes = None
+            if not re.search('utf-8', sys.stdin.encoding, re.IGNORECASE):
+                log.error(f"Bad STDIN encoding '{sys.stdin.encoding}' as opposed to 'utf-8'. \
+                            Suggestion: 'export PYTHONIOENCODING=UTF-8' or use '--input FILENAME' option")
+        else:
+            inp_path = input_file
+            assert isinstance(inp_path, Path)
+            if not inp_path.exists():
+                raise ValueError(f"{inp_path} does not exist.")
+            total_bytes = inp_path.stat().st_size
+
+        # Make sure utf-8 encoding is properly set (in older Python3 versions).
+        if output_file is sys.stdout and not re.search('utf-8', sys.stdout.encoding, re.IGNORECASE):
+            log.error(f"Error: Bad STDIN/STDOUT encoding '{sys.stdout.encoding}' as opposed to 'utf-8'. \
+                        Suggestion: 'export PYTHONIOENCODING=UTF-8' or use use '--output FILENAME' option")
+
+        if args.verbose:
+            log_info = f'Start: {start_time}  Script: tokenize.py'
+            if input_file is not sys.stdin:
+                log_info += f'  Input: {input_file}'
+            if output_file is not sys.stdout:
+                log_info += f'  Output: {output_file.name}'
+            if annotation_file:
+                log_info += f'  Annotation: {annotation_file.name}'
+            if tok.chart_p:
+                log_info += f'  Chart to be built: {tok.chart_p}'
+            if tok.simple_tok_p:
+                log_info += f'  Simple tokenization (no @-@ etc.): {tok.simple_tok_p}'
+            if lang_code:
+                log_info += f'  ISO 639-3 language code: {lang_code}'
+            log.info(log_info)
+        with (contextlib.nullcontext(sys.stdin) if input_file is sys.stdin
+              else open(input_file, encoding='utf-8', errors='surrogateescape')) as f_in:
+            tok.utokenize_lines(ht, input_file=f_in, output_file=output_file, annotation_file=annotation_file,
+                                annotation_format=args.annotation_format, lang_code=lang_code, total_bytes=total_bytes,
+                                progress_bar=args.progress_bar)
+        number_of_lines += ht.pop('NUMBER-OF-LINES', 0)
+        # Close this input file's output and annotation files (unless STDOUT), rather than leaving them open until exit.
+        for f_out in (output_file, annotation_file):
+            if f_out not in (None, sys.stdout):
+                f_out.close()
 
     # Log some change stats.
     if args.profile or tok.profile_scope:
@@ -2189,7 +2221,6 @@ def main():
         ps.print_stats()
     end_time = datetime.datetime.now()
     elapsed_time = end_time - start_time
-    number_of_lines = ht.get('NUMBER-OF-LINES', 0)
     lines = 'line' if number_of_lines == 1 else 'lines'
     if args.verbose:
         log.info(f'End: {end_time}  Elapsed time: {elapsed_time}  Processed {str(number_of_lines)} {lines}')